@@ -1,9 +1,37 @@
 from aiohttp import web
 
-from candy_delivery_app.api import couriers_router, orders_router
+from candy_delivery_app.api import couriers_router, orders_router, stats_router
+from candy_delivery_app.business_models.orders.solver import shutdown_pool
+from candy_delivery_app.db.db import session
+from candy_delivery_app.db.models.deliveries import Delivery
+from candy_delivery_app.db.models.orders import Order
+from candy_delivery_app.models.settings import settings
+
+
+async def build_orders_index(_: web.Application):
+    if not settings.orders_index:
+        return
+
+    async_session = session()
+    try:
+        await Order.rebuild_orders_index(session=async_session)
+    finally:
+        await async_session.close()
+
+
+async def create_deliveries_partitions(_: web.Application):
+    await Delivery.ensure_partitions()
+
+
+async def close_solver_pool(_: web.Application):
+    shutdown_pool()
 
 
 app = web.Application()
 
 app.add_routes(couriers_router)
 app.add_routes(orders_router)
+app.add_routes(stats_router)
+app.on_startup.append(build_orders_index)
+app.on_startup.append(create_deliveries_partitions)
+app.on_cleanup.append(close_solver_pool)
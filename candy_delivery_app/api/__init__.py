@@ -1,2 +1,3 @@
 from .couriers import couriers_router
 from .orders import orders_router
+from .stats import stats_router
@@ -6,7 +6,7 @@ from ..business_models.couriers import (
     CouriersPostRequest,
     CouriersUpdateRequest,
 )
-from ..business_models.couriers.get import CouriersGetRequest
+from ..business_models.couriers.get import CouriersGetRequest, CouriersBatchGetRequest
 from ..db.db import get_session
 
 couriers_router = web.RouteTableDef()
@@ -44,6 +44,26 @@ async def patch_courier(request: Request, session: AsyncSession):
 async def get_courier(request: Request, session: AsyncSession):
 
     response = await CouriersGetRequest.get_courier(session=session, request=request)
+    if response.response_data is None:
+        return web.Response(
+            status=response.status_code,
+            reason=response.reason,
+            headers=response.headers,
+        )
+    return web.json_response(
+        data=response.response_data.dict(exclude_none=True),
+        status=response.status_code,
+        reason=response.reason,
+        headers=response.headers,
+    )
+
+
+@couriers_router.get("/couriers")
+@get_session
+async def get_couriers(request: Request, session: AsyncSession):
+    response = await CouriersBatchGetRequest.get_couriers(
+        session=session, request=request
+    )
     return web.json_response(
         data=response.response_data.dict(exclude_none=True),
         status=response.status_code,
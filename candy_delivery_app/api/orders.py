@@ -7,7 +7,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from ..business_models.orders.post import (
     OrdersPostRequest,
     OrdersAssignPostRequest,
+    OrdersAssignBatchPostRequest,
     OrdersCompletePostRequest,
+    OrdersCompleteBatchPostRequest,
 )
 from ..db.db import get_session
 
@@ -39,6 +41,20 @@ async def assign_orders(request: Request, session: AsyncSession):
     )
 
 
+@orders_router.post("/orders/assign/batch")
+@get_session
+async def assign_orders_batch(request: Request, session: AsyncSession):
+    response = await OrdersAssignBatchPostRequest.assign_orders_batch(
+        session=session, request=request
+    )
+
+    return web.json_response(
+        data=json.loads(response.response_data.json(exclude_none=True)),
+        status=response.status_code,
+        reason=response.reason,
+    )
+
+
 @orders_router.post("/orders/complete")
 @get_session
 async def complete_orders(request: Request, session: AsyncSession):
@@ -50,3 +66,16 @@ async def complete_orders(request: Request, session: AsyncSession):
         status=response.status_code,
         reason=response.reason,
     )
+
+
+@orders_router.post("/orders/complete/batch")
+@get_session
+async def complete_orders_batch(request: Request, session: AsyncSession):
+    response = await OrdersCompleteBatchPostRequest.complete_orders_batch(
+        session=session, request=request
+    )
+    return web.json_response(
+        data=response.response_data.dict(),
+        status=response.status_code,
+        reason=response.reason,
+    )
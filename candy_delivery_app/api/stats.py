@@ -0,0 +1,21 @@
+from aiohttp import web
+from aiohttp.web_request import Request
+
+from ..business_models.orders.solver import solver_stats
+from ..db.couriers_cache import couriers_cache
+from ..db.db import engine
+from ..models.utils import get_hours_cache_stats
+
+stats_router = web.RouteTableDef()
+
+
+@stats_router.get("/stats")
+async def get_stats(request: Request):
+    return web.json_response(
+        data={
+            "solver": solver_stats.dict(),
+            "hours_cache": get_hours_cache_stats(),
+            "couriers_cache": couriers_cache.dict(),
+            "db_pool": engine.pool.dict(),
+        }
+    )
@@ -1,13 +1,14 @@
-from typing import Union
+from typing import Union, Optional, Dict
 
 from ..models._types import STATUS_CODE, REASON
 from ..models.couriers import (
     CouriersBadRequestModel,
     CouriersIds,
     CourierUpdateResponseModel, CourierGetResponseModel, CourierUpdateBadRequestModel,
+    CouriersGetResponseModel,
 )
 from ..models.orders import OrdersAssignPostResponseModel, OrdersCompletePostResponseModel, OrdersBadRequestModel, \
-    OrdersIds
+    OrdersIds, OrdersAssignBatchPostResponseModel, OrdersCompleteBatchPostResponseModel
 
 
 class ApiResponse:
@@ -21,12 +22,18 @@ class ApiResponse:
             CouriersBadRequestModel,
             CourierUpdateResponseModel,
             OrdersAssignPostResponseModel,
+            OrdersAssignBatchPostResponseModel,
             OrdersCompletePostResponseModel,
+            OrdersCompleteBatchPostResponseModel,
             CourierGetResponseModel,
+            CouriersGetResponseModel,
             CourierUpdateBadRequestModel,
             OrdersBadRequestModel,
+            None,
         ],
+        headers: Optional[Dict[str, str]] = None,
     ):
         self.status_code = status_code
         self.reason = reason
         self.response_data = response_data
+        self.headers = headers
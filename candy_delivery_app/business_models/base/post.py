@@ -1,4 +1,5 @@
-from typing import Tuple, List, Type, Union, Callable
+import asyncio
+from typing import Tuple, List, Type, Union, Callable, AsyncIterator, Optional, Any
 
 from aiohttp import web
 from aiohttp.web_request import Request
@@ -7,9 +8,52 @@ from pydantic.main import validate_model
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from candy_delivery_app.business_models import ApiResponse
+from candy_delivery_app.business_models.base.stream import (
+    iter_json_chunks,
+    JsonStreamError,
+    JsonStreamTooLarge,
+)
 from candy_delivery_app.models._types import STATUS_CODE, REASON
 from candy_delivery_app.models.couriers import CouriersBadRequestModel, CouriersIds
 from candy_delivery_app.models.orders import OrdersBadRequestModel, OrdersIds
+from candy_delivery_app.models.settings import settings
+
+
+class StreamValidationError(Exception):
+    pass
+
+
+def get_element_id(element: Any, id_key: str) -> Any:
+    # в data может прийти что угодно, id есть только у объектов
+    return element.get(id_key) if isinstance(element, dict) else None
+
+
+class ValidationErrors:
+    # ошибки валидации, собранные по кускам data
+    def __init__(self, items_key: str):
+        self.items_key = items_key
+        self.bad_data_ids = {}
+        self.errors_data = []
+
+    def add(self, bad_data: Optional[dict]) -> None:
+        if bad_data is None:
+            return
+        validation_error = bad_data["validation_error"]
+        self.bad_data_ids.update(
+            (element["id"], None) for element in validation_error[self.items_key]
+        )
+        self.errors_data.extend(validation_error["errors_data"])
+
+    def __bool__(self) -> bool:
+        return bool(self.errors_data)
+
+    def dict(self) -> dict:
+        return {
+            "validation_error": {
+                self.items_key: [{"id": id_} for id_ in self.bad_data_ids],
+                "errors_data": self.errors_data,
+            }
+        }
 
 
 class BaseBusinessPostModel:
@@ -17,6 +61,15 @@ class BaseBusinessPostModel:
     async def get_model_from_json_data(
         cls, json_data: dict, id_key: str, items_key: str
     ) -> Tuple[STATUS_CODE, REASON, dict]:
+        if (
+            isinstance(json_data.get("data"), list)
+            and len(json_data["data"]) > settings.validation_chunk_size
+            and json_data.keys() == {"data"}
+        ):
+            return await cls.get_model_from_json_data_by_chunks(
+                json_data, id_key=id_key, items_key=items_key
+            )
+
         values, fields_set, error = validate_model(cls, json_data)
         if error is not None:
             return (
@@ -31,6 +84,59 @@ class BaseBusinessPostModel:
             cls.success_handler(values["data"], id_key=id_key, items_key=items_key),
         )
 
+    @classmethod
+    async def get_model_from_json_data_by_chunks(
+        cls, json_data: dict, id_key: str, items_key: str
+    ) -> Tuple[STATUS_CODE, REASON, dict]:
+        """
+        Большие выгрузки валидируются кусками по validation_chunk_size
+        элементов, между кусками управление отдается event loop
+        """
+        data = json_data["data"]
+        values = []
+        errors = ValidationErrors(items_key=items_key)
+
+        for offset in range(0, len(data), settings.validation_chunk_size):
+            chunk_values, chunk_errors = cls.validate_chunk(
+                data[offset : offset + settings.validation_chunk_size],
+                offset=offset,
+                id_key=id_key,
+                items_key=items_key,
+            )
+            values.extend(chunk_values)
+            errors.add(chunk_errors)
+            await asyncio.sleep(0)
+
+        if errors:
+            return (
+                web.HTTPBadRequest.status_code,
+                web.HTTPBadRequest().reason,
+                errors.dict(),
+            )
+
+        return (
+            web.HTTPCreated.status_code,
+            web.HTTPCreated().reason,
+            cls.success_handler(values, id_key=id_key, items_key=items_key),
+        )
+
+    @classmethod
+    def validate_chunk(
+        cls, chunk: List[dict], offset: int, id_key: str, items_key: str
+    ) -> Tuple[List[BaseModel], Optional[dict]]:
+        # кусок data, начинающийся с элемента offset. location в ошибках -
+        # номера элементов во всем запросе
+        values, _, error = validate_model(cls, {"data": chunk})
+        if error is not None:
+            return [], cls.error_handler(
+                {"data": chunk},
+                error,
+                id_key=id_key,
+                items_key=items_key,
+                offset=offset,
+            )
+        return values["data"], None
+
     @classmethod
     def error_handler(
         cls,
@@ -38,6 +144,7 @@ class BaseBusinessPostModel:
         validation_error: ValidationError,
         id_key: str,
         items_key: str,
+        offset: int = 0,
     ) -> dict:
         bad_data_ids = []
 
@@ -47,17 +154,19 @@ class BaseBusinessPostModel:
             "data"
         ]:  # нам могут отправить пустой список (вообще не могу, но пусть будет)
             for error in validation_error.errors():
+                _, element_number, *field = error["loc"]
                 errors_data.append(
                     {
-                        "location": error["loc"],
+                        "location": ("data", offset + element_number, *field),
                         "msg": error["msg"],
                         "type": error["type"],
                     }
                 )
-                element_number = error["loc"][1]
-                element_id = json_data["data"][element_number][id_key]
+                element_id = get_element_id(
+                    json_data["data"][element_number], id_key=id_key
+                )
 
-                if element_id not in bad_data_ids:
+                if element_id is not None and element_id not in bad_data_ids:
                     bad_data_ids.append(element_id)
 
         response_bad_data = {
@@ -75,6 +184,14 @@ class BaseBusinessPostModel:
     ) -> dict:
         return {items_key: [{"id": element.dict()[id_key]} for element in values]}
 
+    @classmethod
+    def is_streaming(cls, request: Request) -> bool:
+        # тело без длины (chunked) или слишком большое разбираем потоком
+        return (
+            request.content_length is None
+            or request.content_length >= settings.streaming_import_min_size
+        )
+
     @classmethod
     async def base_creating(
         cls,
@@ -85,9 +202,21 @@ class BaseBusinessPostModel:
         ],
         success_request_model: Union[Type[CouriersIds], Type[OrdersIds]],
         create_method: Callable,
+        stream_create_method: Callable,
         items_key: str,
         id_key: str,
     ) -> ApiResponse:
+        if cls.is_streaming(request):
+            return await cls.base_stream_creating(
+                session=session,
+                request=request,
+                bad_request_model=bad_request_model,
+                success_request_model=success_request_model,
+                create_method=stream_create_method,
+                items_key=items_key,
+                id_key=id_key,
+            )
+
         json_data = await request.json()
 
         status_code, reason, data = await cls.get_model_from_json_data(
@@ -103,32 +232,154 @@ class BaseBusinessPostModel:
 
         _, errors_ids = await create_method(session=session, json_data=json_data)
         if errors_ids is not None:
-            errors_data = []
-            for error_id in errors_ids:
-                for i, element in enumerate(json_data["data"]):
-                    if element["id"] == error_id:
-                        errors_data.append(
-                            {
-                                "location": ("data", i, id_key),
-                                "msg": "id duplicates",
-                                "type": "IntegrityError",
-                            }
-                        )
+            return cls.duplicates_response(
+                ids=[element["id"] for element in json_data["data"]],
+                errors_ids=errors_ids,
+                bad_request_model=bad_request_model,
+                items_key=items_key,
+                id_key=id_key,
+            )
+        return ApiResponse(
+            status_code=status_code,
+            reason=reason,
+            response_data=success_request_model.parse_obj(data),
+        )
+
+    @classmethod
+    async def base_stream_creating(
+        cls,
+        session: AsyncSession,
+        request: Request,
+        bad_request_model: Union[
+            Type[OrdersBadRequestModel], Type[CouriersBadRequestModel]
+        ],
+        success_request_model: Union[Type[CouriersIds], Type[OrdersIds]],
+        create_method: Callable,
+        items_key: str,
+        id_key: str,
+    ) -> ApiResponse:
+        """
+        Массив data разбирается из тела запроса по кускам, каждый кусок
+        валидируется отдельно и сразу уходит в базу. В памяти остаются только
+        id элементов (для ответа). Ошибки валидации собираются по всему телу с
+        теми же location, что и при обычной выгрузке, и отменяют всю выгрузку
+        """
+        if (
+            request.content_length is not None
+            and request.content_length > settings.streaming_import_max_size
+        ):
+            raise web.HTTPRequestEntityTooLarge(
+                max_size=settings.streaming_import_max_size,
+                actual_size=request.content_length,
+            )
+
+        ids = []
+        errors = ValidationErrors(items_key=items_key)
 
+        async def valid_chunks() -> AsyncIterator[List[dict]]:
+            async for chunk in iter_json_chunks(
+                request.content,
+                key="data",
+                chunk_size=settings.streaming_import_chunk_size,
+                max_size=settings.streaming_import_max_size,
+                max_item_size=settings.streaming_import_max_item_size,
+            ):
+                offset = len(ids)
+                ids.extend(get_element_id(element, id_key=id_key) for element in chunk)
+                _, chunk_errors = cls.validate_chunk(
+                    chunk, offset=offset, id_key=id_key, items_key=items_key
+                )
+                errors.add(chunk_errors)
+
+                # после первой ошибки дочитываем тело только ради ошибок
+                if not errors:
+                    yield chunk
+
+            if errors:
+                raise StreamValidationError
+
+        try:
+            _, errors_ids = await create_method(session=session, chunks=valid_chunks())
+        except StreamValidationError:
+            await session.rollback()
             return ApiResponse(
                 status_code=web.HTTPBadRequest.status_code,
                 reason=web.HTTPBadRequest().reason,
-                response_data=bad_request_model.parse_obj(
+                response_data=bad_request_model.parse_obj(errors.dict()),
+            )
+        except JsonStreamTooLarge as error:
+            await session.rollback()
+            raise web.HTTPRequestEntityTooLarge(
+                max_size=error.max_size, actual_size=error.size
+            )
+        except JsonStreamError:
+            await session.rollback()
+            raise web.HTTPBadRequest
+
+        if not ids:
+            await session.rollback()
+            status_code, reason, data = await cls.get_model_from_json_data(
+                {"data": []}, id_key=id_key, items_key=items_key
+            )
+            return ApiResponse(
+                status_code=status_code,
+                reason=reason,
+                response_data=bad_request_model.parse_obj(data),
+            )
+
+        if errors_ids is not None:
+            return cls.duplicates_response(
+                ids=ids,
+                errors_ids=errors_ids,
+                bad_request_model=bad_request_model,
+                items_key=items_key,
+                id_key=id_key,
+            )
+        return ApiResponse(
+            status_code=web.HTTPCreated.status_code,
+            reason=web.HTTPCreated().reason,
+            response_data=success_request_model.parse_obj(
+                {items_key: [{"id": id_} for id_ in ids]}
+            ),
+        )
+
+    @classmethod
+    def duplicates_response(
+        cls,
+        ids: List[int],
+        errors_ids: List[int],
+        bad_request_model: Union[
+            Type[OrdersBadRequestModel], Type[CouriersBadRequestModel]
+        ],
+        items_key: str,
+        id_key: str,
+    ) -> ApiResponse:
+        # позиции считаем за один проход - выгрузки бывают большими
+        errors_positions = {error_id: [] for error_id in errors_ids}
+        for i, id_ in enumerate(ids):
+            if id_ in errors_positions:
+                errors_positions[id_].append(i)
+
+        errors_data = []
+        for error_id in errors_ids:
+            for i in errors_positions[error_id]:
+                errors_data.append(
                     {
-                        "validation_error": {
-                            items_key: [{"id": id_} for id_ in errors_ids],
-                            "errors_data": errors_data,
-                        }
+                        "location": ("data", i, id_key),
+                        "msg": "id duplicates",
+                        "type": "IntegrityError",
                     }
-                ),
-            )
+                )
+
         return ApiResponse(
-            status_code=status_code,
-            reason=reason,
-            response_data=success_request_model.parse_obj(data),
+            status_code=web.HTTPBadRequest.status_code,
+            reason=web.HTTPBadRequest().reason,
+            response_data=bad_request_model.parse_obj(
+                {
+                    "validation_error": {
+                        items_key: [{"id": id_} for id_ in errors_ids],
+                        "errors_data": errors_data,
+                    }
+                }
+            ),
         )
@@ -0,0 +1,137 @@
+import codecs
+import json
+from typing import Any, AsyncIterator, List
+
+from aiohttp import StreamReader
+
+READ_SIZE = 64 * 1024
+
+WHITESPACE = " \t\n\r"
+
+
+class JsonStreamError(ValueError):
+    pass
+
+
+class JsonStreamTooLarge(JsonStreamError):
+    def __init__(self, max_size: int, size: int):
+        super().__init__(f"body is larger than {max_size} bytes")
+        self.max_size = max_size
+        self.size = size
+
+
+class JsonArrayReader:
+    """
+    Потоковый разбор тела вида {"<key>": [...]}: элементы массива отдаются
+    по мере чтения, целиком тело в памяти не держится. В памяти только
+    текущий элемент, поэтому он ограничен max_item_size символами, а все
+    тело - max_size байтами
+    """
+
+    def __init__(
+        self, content: StreamReader, key: str, max_size: int, max_item_size: int
+    ):
+        self.content = content
+        self.key = key
+        self.max_size = max_size
+        self.max_item_size = max_item_size
+        self.size = 0
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    async def _read_more(self) -> bool:
+        if self.eof:
+            return False
+
+        data = await self.content.read(READ_SIZE)
+        if not data:
+            self.eof = True
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise JsonStreamTooLarge(max_size=self.max_size, size=self.size)
+        self.buffer = self.buffer[self.pos :] + self.text_decoder.decode(
+            data, final=self.eof
+        )
+        self.pos = 0
+        return True
+
+    async def _next_char(self) -> str:
+        # следующий значащий символ, позиция остается на нем
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not await self._read_more():
+                return ""
+
+    async def _expect(self, chars: str) -> str:
+        char = await self._next_char()
+        if not char or char not in chars:
+            raise JsonStreamError(f"expected {chars!r} at {self.pos}")
+        self.pos += 1
+        return char
+
+    async def _read_item_more(self) -> bool:
+        # незаконченный элемент дочитывается и разбирается заново с начала,
+        # без предела это квадратичное время и все тело в памяти
+        if len(self.buffer) - self.pos > self.max_item_size:
+            raise JsonStreamError(
+                f"item at {self.pos} is larger than {self.max_item_size}"
+            )
+        return await self._read_more()
+
+    async def _decode_value(self) -> Any:
+        await self._next_char()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if await self._read_item_more():
+                    continue
+                raise JsonStreamError(f"invalid json at {self.pos}")
+
+            # число могло оборваться на границе прочитанного куска
+            if end == len(self.buffer) and await self._read_item_more():
+                continue
+
+            self.pos = end
+            return value
+
+    async def items(self) -> AsyncIterator[Any]:
+        await self._expect("{")
+        if await self._next_char() != '"' or await self._decode_value() != self.key:
+            raise JsonStreamError(f"expected {self.key!r} key")
+        await self._expect(":")
+        await self._expect("[")
+
+        if await self._next_char() == "]":
+            self.pos += 1
+        else:
+            while True:
+                yield await self._decode_value()
+                if await self._expect(",]") == "]":
+                    break
+
+        await self._expect("}")
+        if await self._next_char():
+            raise JsonStreamError("extra data after json")
+
+
+async def iter_json_chunks(
+    content: StreamReader, key: str, chunk_size: int, max_size: int, max_item_size: int
+) -> AsyncIterator[List[Any]]:
+    chunk = []
+    reader = JsonArrayReader(
+        content=content, key=key, max_size=max_size, max_item_size=max_item_size
+    )
+    async for item in reader.items():
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -2,14 +2,18 @@ from typing import Tuple
 
 from aiohttp import web
 from aiohttp.web_request import Request
+from pydantic import validate_model
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from candy_delivery_app.business_models import ApiResponse
 from candy_delivery_app.business_models.couriers.patch import CourierIdRequest
-from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.couriers_cache import couriers_cache
+from candy_delivery_app.db.models.couriers import Courier, CourierLoading
 from candy_delivery_app.models._types import STATUS_CODE, REASON, MODEL_DATA
 from candy_delivery_app.models.couriers import (
     CourierGetResponseModel,
+    CouriersGetRequestModel,
+    CouriersGetResponseModel,
 )
 
 
@@ -31,13 +35,65 @@ class CouriersGetRequest(CourierGetResponseModel):
     def success_handler(values):
         return values
 
+    @staticmethod
+    def get_etag(version: int) -> str:
+        return f'"{version}"'
+
+    @staticmethod
+    def etag_matches(etag: str, if_none_match: str) -> bool:
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
     @classmethod
     async def get_courier(cls, session: AsyncSession, request: Request) -> ApiResponse:
         status_code, reason, data = await cls.get_model_from_json_data(request=request)
-        courier = await Courier.get_all_data_courier(session=session, courier_id=data)
+
+        # клиент уже знает какую-то версию - сверяем одну колонку
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match is not None:
+            version = await Courier.get_version(session=session, courier_id=data)
+            if version is None:
+                raise web.HTTPNotFound
+
+            etag = cls.get_etag(version)
+            if cls.etag_matches(etag, if_none_match):
+                return ApiResponse(
+                    status_code=web.HTTPNotModified.status_code,
+                    reason=web.HTTPNotModified().reason,
+                    response_data=None,
+                    headers={"ETag": etag},
+                )
+
+        generation = couriers_cache.generation
+        cached = couriers_cache.get(data)
+        if cached is None:
+            cached = await cls.get_courier_response_data(
+                session=session, courier_id=data
+            )
+            couriers_cache.set(data, cached, generation=generation)
+        version, response_data = cached
+
+        return ApiResponse(
+            status_code=status_code,
+            reason=reason,
+            response_data=response_data,
+            headers={"ETag": cls.get_etag(version)},
+        )
+
+    @classmethod
+    async def get_courier_response_data(
+        cls, session: AsyncSession, courier_id: int
+    ) -> Tuple[int, CourierGetResponseModel]:
+        courier = await Courier.get_all_data_courier(
+            session=session, courier_id=courier_id
+        )
         if courier is None:
             raise web.HTTPNotFound
 
+        return courier.version, cls.get_response_data_from_courier(courier)
+
+    @staticmethod
+    def get_response_data_from_courier(courier: Courier) -> CourierGetResponseModel:
         response = {
             "courier_id": courier.id,
             "courier_type": courier.courier_type,
@@ -45,13 +101,80 @@ class CouriersGetRequest(CourierGetResponseModel):
             "working_hours": courier.working_hours,
         }
 
-        if courier.delivery_data:
+        if courier.rating is not None:
             response["rating"] = courier.rating
 
         response["earnings"] = courier.earnings
 
+        return CourierGetResponseModel.parse_obj(response)
+
+
+class CouriersBatchGetRequest(CouriersGetRequestModel):
+    @classmethod
+    async def get_model_from_json_data(
+        cls, request: Request
+    ) -> Tuple[STATUS_CODE, REASON, MODEL_DATA]:
+        # ?ids=1,2,3 или ?ids=1&ids=2
+        ids = [
+            courier_id
+            for value in request.query.getall("ids", [])
+            for courier_id in value.split(",")
+            if courier_id
+        ]
+        values, _, error = validate_model(cls, {"ids": ids})
+        if error is not None:
+            raise web.HTTPBadRequest
+
+        return web.HTTPOk.status_code, web.HTTPOk().reason, values["ids"]
+
+    @classmethod
+    async def get_couriers(cls, session: AsyncSession, request: Request) -> ApiResponse:
+        """
+        Несколько курьеров одним запросом к базе, ответы те же, что у
+        GET /couriers/{id}. Курьеры из кэша в базу не запрашиваются
+        """
+        status_code, reason, couriers_ids = await cls.get_model_from_json_data(
+            request=request
+        )
+        couriers_ids = list(dict.fromkeys(couriers_ids))
+
+        generation = couriers_cache.generation
+        profiles = {}
+        for courier_id in couriers_ids:
+            cached = couriers_cache.get(courier_id)
+            if cached is not None:
+                profiles[courier_id] = cached[1]
+
+        missing_ids = [
+            courier_id for courier_id in couriers_ids if courier_id not in profiles
+        ]
+        if missing_ids:
+            for courier in await Courier.get_couriers(
+                session=session,
+                couriers_ids=missing_ids,
+                loading=CourierLoading.SCALARS,
+            ):
+                response_data = CouriersGetRequest.get_response_data_from_courier(
+                    courier
+                )
+                couriers_cache.set(
+                    courier.id, (courier.version, response_data), generation=generation
+                )
+                profiles[courier.id] = response_data
+
         return ApiResponse(
             status_code=status_code,
             reason=reason,
-            response_data=CourierGetResponseModel.parse_obj(response),
+            response_data=CouriersGetResponseModel(
+                couriers=[
+                    profiles[courier_id]
+                    for courier_id in couriers_ids
+                    if courier_id in profiles
+                ],
+                not_found=[
+                    courier_id
+                    for courier_id in couriers_ids
+                    if courier_id not in profiles
+                ],
+            ),
         )
@@ -24,6 +24,7 @@ class CouriersPostRequest(CouriersPostRequestModel, BaseBusinessPostModel):
             bad_request_model=CouriersBadRequestModel,
             success_request_model=CouriersIds,
             create_method=Courier.create_couriers,
+            stream_create_method=Courier.create_couriers_from_stream,
             items_key="couriers",
             id_key="courier_id",
         )
@@ -8,6 +8,7 @@ from dateutil import parser
 
 from candy_delivery_app.business_models import ApiResponse
 from candy_delivery_app.business_models.base.post import BaseBusinessPostModel
+from candy_delivery_app.db.models.couriers import Courier
 from candy_delivery_app.db.models.orders import Order
 from candy_delivery_app.models._types import STATUS_CODE, REASON
 from candy_delivery_app.models.orders import (
@@ -16,8 +17,12 @@ from candy_delivery_app.models.orders import (
     OrdersBadRequestModel,
     OrdersAssignPostRequestModel,
     OrdersAssignPostResponseModel,
+    OrdersAssignBatchPostRequestModel,
+    OrdersAssignBatchPostResponseModel,
     OrdersCompletePostRequestModel,
     OrdersCompletePostResponseModel,
+    OrdersCompleteBatchPostRequestModel,
+    OrdersCompleteBatchPostResponseModel,
 )
 
 
@@ -32,6 +37,7 @@ class OrdersPostRequest(OrdersPostRequestModel, BaseBusinessPostModel):
             bad_request_model=OrdersBadRequestModel,
             success_request_model=OrdersIds,
             create_method=Order.create_orders,
+            stream_create_method=Order.create_orders_from_stream,
             items_key="orders",
             id_key="order_id",
         )
@@ -69,8 +75,8 @@ class OrdersAssignPostRequest(OrdersAssignPostRequestModel):
         )
         response_data: Dict[str, Union[List[Dict[str, int]], str]] = {"orders": []}
 
-        for order in orders:
-            response_data["orders"].append({"id": order.id})
+        for order_id in orders:
+            response_data["orders"].append({"id": order_id})
 
         if orders:
             response_data["assign_time"] = assign_time
@@ -80,6 +86,53 @@ class OrdersAssignPostRequest(OrdersAssignPostRequestModel):
         return ApiResponse(status_code=response, reason=reason, response_data=model)
 
 
+class OrdersAssignBatchPostRequest(OrdersAssignBatchPostRequestModel):
+    @classmethod
+    async def get_model_from_json_data(
+        cls, json_data: dict
+    ) -> Tuple[STATUS_CODE, REASON, dict]:
+        values, fields_set, error = validate_model(cls, json_data)
+        if error is not None:
+            raise web.HTTPBadRequest
+
+        return (
+            web.HTTPOk.status_code,
+            web.HTTPOk().reason,
+            cls.success_handler(values),
+        )
+
+    @classmethod
+    def success_handler(cls, values: Dict[str, List[int]]) -> Dict[str, List[int]]:
+        return values
+
+    @classmethod
+    async def assign_orders_batch(
+        cls, session: AsyncSession, request: Request
+    ) -> ApiResponse:
+        json_data = await request.json()
+
+        response, reason, data = await cls.get_model_from_json_data(json_data)
+
+        assigned = await Order.get_orders_for_couriers(
+            session=session, couriers_ids=data["couriers_ids"]
+        )
+
+        couriers_data = []
+        for courier_id in data["couriers_ids"]:
+            assign_time, orders = assigned[courier_id]
+            courier_data = {
+                "courier_id": courier_id,
+                "orders": [{"id": order_id} for order_id in orders],
+            }
+            if orders:
+                courier_data["assign_time"] = assign_time
+            couriers_data.append(courier_data)
+
+        model = OrdersAssignBatchPostResponseModel(couriers=couriers_data)
+
+        return ApiResponse(status_code=response, reason=reason, response_data=model)
+
+
 class OrdersCompletePostRequest(OrdersCompletePostRequestModel):
     @classmethod
     async def get_model_from_json_data(
@@ -114,21 +167,62 @@ class OrdersCompletePostRequest(OrdersCompletePostRequestModel):
         )
         complete_time = parser.isoparse(complete_time)
 
-        order = await Order.get_one(session=session, _id=order_id)
-        if (
-            order is None
-            or (order.courier_id is None and not order.completed)
-            or (not order.completed and order.courier_id != courier_id)
-            or (order.completed and order.old_courier_id != courier_id)
-            or (order.completed and order.completed_time != complete_time.isoformat())
+        await Courier.lock(session=session, courier_id=courier_id)
+        if not await Order.complete_order(
+            session=session,
+            order_id=order_id,
+            courier_id=courier_id,
+            complete_time=complete_time,
         ):
             raise web.HTTPBadRequest
 
-        await Order.complete_order(
-            session=session, order_id=order_id, complete_time=complete_time
-        )
         return ApiResponse(
             status_code=web.HTTPOk.status_code,
             reason=web.HTTPOk().reason,
             response_data=OrdersCompletePostResponseModel(**{"order_id": order_id}),
         )
+
+
+class OrdersCompleteBatchPostRequest(OrdersCompleteBatchPostRequestModel):
+    @classmethod
+    async def get_model_from_json_data(
+        cls, json_data: dict
+    ) -> Tuple[STATUS_CODE, REASON, dict]:
+        values, fields_set, error = validate_model(cls, json_data)
+        if error is not None:
+            raise web.HTTPBadRequest
+
+        return (
+            web.HTTPOk.status_code,
+            web.HTTPOk().reason,
+            cls.success_handler(values),
+        )
+
+    @classmethod
+    def success_handler(cls, values: Dict[str, list]) -> Dict[str, list]:
+        return values
+
+    @classmethod
+    async def complete_orders_batch(
+        cls, session: AsyncSession, request: Request
+    ) -> ApiResponse:
+        json_data = await request.json()
+
+        response, reason, data = await cls.get_model_from_json_data(json_data)
+
+        # те же правила, что и в OrdersCompletePostRequest: повторное
+        # завершение тем же курьером в то же время - успех
+        completions = [
+            (item.order_id, item.courier_id, parser.isoparse(item.complete_time))
+            for item in data["orders"]
+        ]
+        results = await Order.complete_orders(session=session, completions=completions)
+
+        model = OrdersCompleteBatchPostResponseModel(
+            orders=[
+                {"order_id": order_id, "courier_id": courier_id, "completed": ok}
+                for (order_id, courier_id, _), ok in zip(completions, results)
+            ]
+        )
+
+        return ApiResponse(status_code=response, reason=reason, response_data=model)
@@ -0,0 +1,80 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from candy_delivery_app.business_models.orders.utils import (
+    MAX_BEST_ORDERS_CANDIDATES,
+    T,
+    get_solver_input,
+    solve_best_orders,
+)
+from candy_delivery_app.metrics import TimingStats
+from candy_delivery_app.models.settings import settings
+
+
+class SolverStats:
+    def __init__(self):
+        self.inline_solve_time = TimingStats()
+        self.pool_queue_wait = TimingStats()
+        self.pool_solve_time = TimingStats()
+
+    def dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            "inline_solve_time": self.inline_solve_time.dict(),
+            "pool_queue_wait": self.pool_queue_wait.dict(),
+            "pool_solve_time": self.pool_solve_time.dict(),
+        }
+
+
+solver_stats = SolverStats()
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.solver_pool_size)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def _timed_solve(
+    weights: List[int], weight_limit: int
+) -> Tuple[List[int], float, float]:
+    # time.monotonic в linux общий для всех процессов, так что время
+    # ожидания в очереди пула можно считать по разнице с родителем
+    started = time.monotonic()
+    result = solve_best_orders(weights, weight_limit)
+    return result, started, time.monotonic() - started
+
+
+async def get_best_orders_async(raw_orders: Sequence[T], capacity: int) -> List[T]:
+    """
+    То же, что get_best_orders, но большие задачи (от
+    solver_inline_max_candidates кандидатов) при включенном solver_pool
+    решаются в пуле процессов, чтобы не держать event loop
+    """
+    raw_orders = raw_orders[:MAX_BEST_ORDERS_CANDIDATES]
+    weights, weight_limit = get_solver_input(raw_orders, capacity)
+
+    if not settings.solver_pool or len(weights) < settings.solver_inline_max_candidates:
+        started = time.monotonic()
+        result = solve_best_orders(weights, weight_limit)
+        solver_stats.inline_solve_time.add(time.monotonic() - started)
+    else:
+        submitted = time.monotonic()
+        result, started, solve_time = await asyncio.get_running_loop().run_in_executor(
+            get_pool(), _timed_solve, weights, weight_limit
+        )
+        solver_stats.pool_queue_wait.add(max(started - submitted, 0.0))
+        solver_stats.pool_solve_time.add(solve_time)
+
+    return [raw_orders[i] for i in result]
@@ -1,25 +1,60 @@
-from functools import lru_cache
-
-
-def get_best_orders(raw_orders, capacity: int):
-    @lru_cache(maxsize=None)
-    def best_weight(items_number, weight_limit):
-        if items_number == 0:
-            return items_number
-        elif raw_orders[items_number - 1].weight > weight_limit:
-            return best_weight(items_number - 1, weight_limit)
-        return max(
-            best_weight(items_number - 1, weight_limit),
-            best_weight(
-                items_number - 1, weight_limit - raw_orders[items_number - 1].weight
-            )
-            + raw_orders[items_number - 1].weight,
-        )
+from typing import List, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# веса считаем в сотых долях килограмма, чтобы не ловить ошибки округления float
+WEIGHT_SCALE = 100
+
+# больше кандидатов не рассматриваем - берем самые легкие (заказы приходят
+# отсортированными по весу). Таблица занимает
+# MAX_BEST_ORDERS_CANDIDATES * (capacity * WEIGHT_SCALE + 1) бит,
+# для машины (50 кг) это около 3 МБ
+MAX_BEST_ORDERS_CANDIDATES = 5000
+
+
+def to_centi_weight(weight: float) -> int:
+    return int(round(weight * WEIGHT_SCALE))
+
+
+def _best_weight(reachable: int, weight_limit: int) -> int:
+    # наибольший достижимый вес, не превышающий weight_limit
+    return (reachable & ((1 << (weight_limit + 1)) - 1)).bit_length() - 1
+
+
+def solve_best_orders(weights: List[int], weight_limit: int) -> List[int]:
+    """
+    Рюкзак 0/1 снизу вверх, веса и вместимость - целые сотые доли килограмма.
+    Возвращает индексы выбранных заказов.
+
+    Строка таблицы i - битовая маска весов, которые можно набрать первыми
+    i заказами (бит w выставлен, если вес w достижим). Восстановление ответа
+    идет с конца, как и в прежнем рекурсивном варианте, поэтому набор и
+    порядок заказов в ответе совпадают.
+    """
+    full_mask = (1 << (weight_limit + 1)) - 1
+    rows = [1]
+    for weight in weights:
+        rows.append((rows[-1] | (rows[-1] << weight)) & full_mask)
 
     result = []
-    for i in reversed(range(len(raw_orders))):
-        if best_weight(i + 1, capacity) > best_weight(i, capacity):
-            result.append(raw_orders[i])
-            capacity -= raw_orders[i].weight
+    for i in reversed(range(len(weights))):
+        if _best_weight(rows[i + 1], weight_limit) > _best_weight(
+            rows[i], weight_limit
+        ):
+            result.append(i)
+            weight_limit -= weights[i]
 
     return result
+
+
+def get_solver_input(raw_orders: Sequence[T], capacity: int) -> Tuple[List[int], int]:
+    return (
+        [to_centi_weight(order.weight) for order in raw_orders],
+        capacity * WEIGHT_SCALE,
+    )
+
+
+def get_best_orders(raw_orders: Sequence[T], capacity: int) -> List[T]:
+    raw_orders = raw_orders[:MAX_BEST_ORDERS_CANDIDATES]
+    weights, weight_limit = get_solver_input(raw_orders, capacity)
+    return [raw_orders[i] for i in solve_best_orders(weights, weight_limit)]
@@ -0,0 +1,144 @@
+import json
+from itertools import islice
+from typing import Any, Callable, Iterable, List, Tuple
+
+from sqlalchemy import Column, Enum, JSON, ARRAY, Table, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from candy_delivery_app.db.models.utils import MinutesMask
+
+dialect = postgresql.dialect()
+
+
+async def get_asyncpg_connection(session: AsyncSession):
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    return raw_connection.driver_connection
+
+
+def _copy_column(column: Column) -> Tuple[str, str, Callable[[Any], Any]]:
+    """
+    Тип колонки во временной таблице, выражение для переноса из нее в
+    основную таблицу и преобразование значения для COPY. Типы, которые
+    asyncpg не умеет передавать в бинарном COPY, идут текстом
+    """
+    name, type_ = column.name, column.type
+
+    if isinstance(type_, MinutesMask):
+        return "TEXT", f"{name}::INT4MULTIRANGE", type_.bind_processor(dialect)
+    if isinstance(type_, Enum):
+        # значения из json приводятся к именам элементов перечисления
+        return "TEXT", f"{name}::{type_.name}", type_.bind_processor(dialect)
+    if isinstance(type_, ARRAY) and isinstance(type_.item_type, JSON):
+        return (
+            "TEXT[]",
+            f"{name}::JSON[]",
+            lambda value: None if value is None else [json.dumps(v) for v in value],
+        )
+    if isinstance(type_, JSON):
+        return (
+            "TEXT",
+            f"{name}::JSON",
+            lambda value: None if value is None else json.dumps(value),
+        )
+    return type_.compile(dialect=dialect), name, lambda value: value
+
+
+def get_column_default(column: Column) -> Any:
+    if column.default is not None and column.default.is_scalar:
+        return column.default.arg
+    return None
+
+
+class CopyImport:
+    """
+    Заливка строк через бинарный COPY во временную таблицу с переносом в
+    table одним INSERT ... SELECT в конце. Строки можно отправлять любыми
+    порциями по мере поступления. Все в транзакции сессии, коммит
+    остается вызывающему
+    """
+
+    def __init__(self, session: AsyncSession, table: Table):
+        self.session = session
+        self.table = table
+        self.staging = f"{table.name}_import"
+        columns = list(table.columns)
+        self.names = [column.name for column in columns]
+        self.copy_columns = [_copy_column(column) for column in columns]
+        self.defaults = [get_column_default(column) for column in columns]
+        self.connection = None
+
+    async def start(self) -> None:
+        # DDL через сессию, чтобы транзакция уже была открыта к моменту COPY
+        await self.session.execute(
+            text(
+                f"CREATE TEMP TABLE {self.staging} ("
+                + ", ".join(
+                    f"{name} {copy_type}"
+                    for name, (copy_type, _, _) in zip(self.names, self.copy_columns)
+                )
+                + ") ON COMMIT DROP"
+            )
+        )
+        self.connection = await get_asyncpg_connection(self.session)
+
+    async def copy(self, rows: List[dict]) -> None:
+        await self.connection.copy_records_to_table(
+            self.staging,
+            columns=self.names,
+            records=[
+                tuple(
+                    to_db(row.get(name, default))
+                    for name, default, (_, _, to_db) in zip(
+                        self.names, self.defaults, self.copy_columns
+                    )
+                )
+                for row in rows
+            ],
+        )
+
+    async def finish(self) -> List[int]:
+        """
+        Переносит строки в основную таблицу. Возвращает id, которые уже есть
+        в базе или повторяются в самих данных - если они есть, транзакцию
+        нужно откатить.
+        Дубликаты находятся той же командой, что и вставляет строки, поэтому
+        параллельная выгрузка тех же id не проскочит между проверкой и вставкой
+        """
+        staging = self.staging
+        select = ", ".join(select for _, select, _ in self.copy_columns)
+        return (
+            (
+                await self.session.execute(
+                    text(
+                        f"WITH inserted AS ("
+                        f"INSERT INTO {self.table.name} ({', '.join(self.names)}) "
+                        f"SELECT {select} FROM {staging} "
+                        f"ON CONFLICT (id) DO NOTHING RETURNING id) "
+                        f"SELECT s.id FROM {staging} s "
+                        f"LEFT JOIN inserted i ON i.id = s.id WHERE i.id IS NULL "
+                        f"UNION SELECT id FROM {staging} GROUP BY id HAVING count(*) > 1"
+                    )
+                )
+            )
+            .scalars()
+            .all()
+        )
+
+
+async def copy_insert(
+    session: AsyncSession, table: Table, rows: Iterable[dict], chunk_size: int
+) -> List[int]:
+    # заливка готового набора строк кусками по chunk_size, см. CopyImport
+    copy_import = CopyImport(session=session, table=table)
+    await copy_import.start()
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        await copy_import.copy(chunk)
+
+    return await copy_import.finish()
@@ -0,0 +1,79 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from candy_delivery_app.models.settings import settings
+
+
+class CouriersCache:
+    """
+    Готовые ответы GET /couriers/{id} (версия курьера и профиль) в памяти
+    процесса, LRU с TTL.
+    Изменения курьеров из этого процесса сбрасывают записи сразу, из других
+    воркеров - видны не позже чем через couriers_cache_ttl секунд
+    """
+
+    def __init__(self):
+        self._profiles: "OrderedDict[int, Tuple[float, Any]]" = OrderedDict()
+        # номер последнего сброса: ответ, прочитанный из базы до сброса,
+        # в кэш уже не кладем
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.couriers_cache
+
+    def get(self, courier_id: int) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        cached = self._profiles.get(courier_id)
+        if cached is None or cached[0] < time.monotonic():
+            self.misses += 1
+            return None
+
+        self._profiles.move_to_end(courier_id)
+        self.hits += 1
+        return cached[1]
+
+    def set(self, courier_id: int, profile: Any, generation: int) -> None:
+        if not self.enabled or generation != self.generation:
+            return
+
+        self._profiles[courier_id] = (
+            time.monotonic() + settings.couriers_cache_ttl,
+            profile,
+        )
+        self._profiles.move_to_end(courier_id)
+        while len(self._profiles) > settings.couriers_cache_size:
+            self._profiles.popitem(last=False)
+
+    def invalidate(self, couriers_ids: Iterable[int]) -> None:
+        self.generation += 1
+        for courier_id in couriers_ids:
+            if self._profiles.pop(courier_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._profiles.clear()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def dict(self) -> Dict[str, float]:
+        requests = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "size": len(self._profiles),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+couriers_cache = CouriersCache()
@@ -3,10 +3,11 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.pool import get_engine_options
 
 Base = declarative_base()
 
-engine = create_async_engine(DB_URI.get(), echo=False)
+engine = create_async_engine(DB_URI.get(), echo=False, **get_engine_options())
 
 session = sessionmaker(engine, class_=AsyncSession)
 
@@ -25,13 +26,22 @@ def get_session(func):
 
 
 async def update_base():
+    """
+    Полный сброс базы: все данные удаляются. Для обновления схемы без потери
+    данных есть migrate.py
+    """
+    from candy_delivery_app.db.couriers_cache import couriers_cache
+    from candy_delivery_app.db.migrations import migrate
+
     async_session = session(expire_on_commit=False)
 
+    await async_session.execute("DROP TABLE IF EXISTS deliveries CASCADE")
+    await async_session.execute("DROP TABLE IF EXISTS courier_region_stats CASCADE")
     await async_session.execute("DROP TABLE IF EXISTS orders CASCADE")
     await async_session.execute("DROP TABLE IF EXISTS couriers CASCADE")
+    await async_session.execute("DROP TABLE IF EXISTS schema_migrations CASCADE")
     await async_session.commit()
 
     await async_session.close()
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate()
+    couriers_cache.clear()
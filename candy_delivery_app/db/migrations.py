@@ -0,0 +1,315 @@
+import datetime
+from typing import Awaitable, Callable, List, NamedTuple
+
+from sqlalchemy import (
+    ARRAY,
+    Boolean,
+    Column,
+    DateTime,
+    Enum,
+    FLOAT,
+    ForeignKey,
+    Integer,
+    JSON,
+    MetaData,
+    String,
+    Table,
+    func,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.db import Base, engine
+
+from candy_delivery_app.db.models.deliveries import Delivery
+from candy_delivery_app.models.settings import settings
+
+MIGRATIONS_LOCK_ID = 2
+
+schema_migrations = Table(
+    "schema_migrations",
+    Base.metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime, default=datetime.datetime.utcnow),
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[AsyncConnection], Awaitable[None]]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """
+    Миграции выполняются вне транзакции (чтобы работал CREATE INDEX
+    CONCURRENTLY), поэтому каждая должна спокойно переживать повторный запуск
+    """
+
+    def decorator(func_):
+        MIGRATIONS.append(Migration(version, description, func_))
+        return func_
+
+    return decorator
+
+
+async def has_column(conn: AsyncConnection, table: str, column: str) -> bool:
+    return (
+        await conn.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = :table AND column_name = :column)"
+            ),
+            {"table": table, "column": column},
+        )
+    ).scalar()
+
+
+# схема первой версии. Дальше таблицы меняются только миграциями, поэтому
+# здесь свои определения, а не модели: с моделями первая миграция создавала
+# бы в новой базе уже измененную схему
+initial_metadata = MetaData()
+
+Table(
+    "couriers",
+    initial_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("courier_type", Enum("FOOT", "BIKE", "CAR", name="couriertype")),
+    Column("regions", ARRAY(Integer)),
+    Column("working_hours", ARRAY(String)),
+    Column("working_hours_timedeltas", ARRAY(JSON)),
+    Column("rating", FLOAT, nullable=True),
+    Column("earnings", Integer),
+    Column("last_delivery_time", FLOAT, nullable=True),
+    Column("delivery_data", JSON, nullable=True),
+)
+
+Table(
+    "orders",
+    initial_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("weight", FLOAT),
+    Column("region", Integer),
+    Column("delivery_hours", ARRAY(String)),
+    Column("delivery_hours_timedeltas", ARRAY(JSON)),
+    Column("assign_time", String, nullable=True),
+    Column("completed", Boolean),
+    Column("courier_id", Integer, ForeignKey("couriers.id")),
+    Column("old_courier_id", Integer, nullable=True),
+    Column("cost", Integer),
+    Column("completed_time", String, nullable=True),
+)
+
+
+async def create_index_concurrently(
+    conn: AsyncConnection, name: str, definition: str
+) -> None:
+    # прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс,
+    # IF NOT EXISTS его бы пропустил - такой индекс пересоздаем
+    invalid = (
+        await conn.execute(
+            text(
+                "SELECT EXISTS (SELECT 1 FROM pg_index i "
+                "JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE c.relname = :name AND NOT i.indisvalid)"
+            ),
+            {"name": name},
+        )
+    ).scalar()
+    if invalid:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    await conn.execute(
+        text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+    )
+
+
+@migration(1, "initial schema")
+async def initial_schema(conn: AsyncConnection) -> None:
+    await conn.run_sync(initial_metadata.create_all)
+
+
+@migration(2, "hours masks as int4multirange")
+async def hours_masks(conn: AsyncConnection) -> None:
+    for table, column in (
+        ("couriers", "working_hours"),
+        ("orders", "delivery_hours"),
+    ):
+        await conn.execute(
+            text(
+                f"ALTER TABLE {table} "
+                f"ADD COLUMN IF NOT EXISTS {column}_mask INT4MULTIRANGE"
+            )
+        )
+        await conn.execute(
+            text(
+                f"UPDATE {table} SET {column}_mask = coalesce(("
+                f"SELECT range_agg(int4range("
+                f"(t->>'first_time')::int / 60, (t->>'second_time')::int / 60)) "
+                f"FROM unnest({column}_timedeltas) t "
+                f"WHERE (t->>'first_time')::int / 60 < (t->>'second_time')::int / 60"
+                f"), '{{}}') WHERE {column}_mask IS NULL"
+            )
+        )
+    await create_index_concurrently(
+        conn,
+        "ix_orders_delivery_hours_mask",
+        "orders USING gist (delivery_hours_mask)",
+    )
+
+
+@migration(3, "indexes for assign, complete and couriers loading")
+async def hot_path_indexes(conn: AsyncConnection) -> None:
+    await create_index_concurrently(
+        conn,
+        "ix_orders_free_region_weight",
+        "orders (region, weight) WHERE NOT completed AND courier_id IS NULL",
+    )
+    await create_index_concurrently(conn, "ix_orders_courier_id", "orders (courier_id)")
+    await create_index_concurrently(
+        conn, "ix_couriers_regions", "couriers USING gin (regions)"
+    )
+
+
+@migration(4, "precomputed couriers rating")
+async def couriers_rating(conn: AsyncConnection) -> None:
+    # раньше рейтинг пересчитывался при каждом GET /couriers/{id}, поэтому
+    # у курьеров, которых с последнего развоза не запрашивали, он устарел
+    await conn.execute(
+        text(
+            "UPDATE couriers SET rating = round(("
+            "(3600 - least(best.avg_time, 3600)) / 3600 * 5)::numeric, 2) "
+            "FROM ("
+            "SELECT averages.id, min(averages.avg_time) AS avg_time FROM ("
+            "SELECT c.id, avg(times.value::text::float8) AS avg_time "
+            "FROM couriers c, json_each(c.delivery_data -> 'regions') regions, "
+            "json_array_elements(regions.value) times "
+            "GROUP BY c.id, regions.key"
+            ") averages GROUP BY averages.id"
+            ") best WHERE couriers.id = best.id"
+        )
+    )
+
+
+@migration(5, "couriers version")
+async def couriers_version(conn: AsyncConnection) -> None:
+    await conn.execute(
+        text(
+            "ALTER TABLE couriers "
+            "ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1"
+        )
+    )
+
+
+@migration(6, "deliveries table instead of couriers delivery_data")
+async def deliveries_table(conn: AsyncConnection) -> None:
+    await conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS deliveries ("
+            "order_id INTEGER NOT NULL, "
+            "completed_at TIMESTAMP WITH TIME ZONE NOT NULL, "
+            "courier_id INTEGER NOT NULL, "
+            "region INTEGER NOT NULL, "
+            "bag_id INTEGER NOT NULL, "
+            "duration FLOAT NOT NULL, "
+            "PRIMARY KEY (order_id, completed_at)"
+            ") PARTITION BY RANGE (completed_at)"
+        )
+    )
+    await conn.execute(
+        text(
+            "CREATE INDEX IF NOT EXISTS ix_deliveries_courier_bag "
+            "ON deliveries (courier_id, bag_id)"
+        )
+    )
+    await conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS courier_region_stats ("
+            "courier_id INTEGER NOT NULL REFERENCES couriers (id), "
+            "region INTEGER NOT NULL, "
+            "deliveries INTEGER NOT NULL, "
+            "total_time FLOAT NOT NULL, "
+            "PRIMARY KEY (courier_id, region)"
+            ")"
+        )
+    )
+    await Delivery.create_partitions(
+        conn,
+        today=datetime.datetime.utcnow().date(),
+        months_ahead=settings.deliveries_partitions_ahead,
+    )
+    await conn.execute(
+        text(
+            "ALTER TABLE couriers "
+            "ADD COLUMN IF NOT EXISTS bag_id INTEGER NOT NULL DEFAULT 1"
+        )
+    )
+    if not await has_column(conn, "couriers", "delivery_data"):
+        return
+
+    # времена отдельных доставок из regions в итоги по районам, а начатый
+    # развоз (not_completed_regions) - строками deliveries первого развоза
+    # со временем последней доставки курьера. Номера заказов в delivery_data
+    # не хранились, у этих строк они отрицательные
+    await conn.execute(
+        text(
+            "INSERT INTO courier_region_stats "
+            "(courier_id, region, deliveries, total_time) "
+            "SELECT c.id, regions.key::int, count(*), sum(times.value::text::float8) "
+            "FROM couriers c, json_each(c.delivery_data -> 'regions') regions, "
+            "json_array_elements(regions.value) times "
+            "GROUP BY c.id, regions.key "
+            "ON CONFLICT DO NOTHING"
+        )
+    )
+    await conn.execute(
+        text(
+            "INSERT INTO deliveries "
+            "(order_id, completed_at, courier_id, region, bag_id, duration) "
+            "SELECT -row_number() OVER (), to_timestamp(c.last_delivery_time), "
+            "c.id, regions.key::int, 1, times.value::text::float8 "
+            "FROM couriers c, "
+            "json_each(c.delivery_data -> 'not_completed_regions') regions, "
+            "json_array_elements(regions.value) times "
+            "WHERE NOT EXISTS (SELECT 1 FROM deliveries d WHERE d.courier_id = c.id)"
+        )
+    )
+    await conn.execute(text("ALTER TABLE couriers DROP COLUMN IF EXISTS delivery_data"))
+
+
+async def migrate() -> List[Migration]:
+    """
+    Применяет все еще не примененные миграции по порядку версий
+    """
+    applied_now = []
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        # несколько воркеров могут стартовать одновременно
+        await conn.execute(select(func.pg_advisory_lock(MIGRATIONS_LOCK_ID)))
+        try:
+            await conn.run_sync(schema_migrations.create, checkfirst=True)
+            applied = {
+                version
+                for (version,) in await conn.execute(
+                    select(schema_migrations.c.version)
+                )
+            }
+            for migration_ in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration_.version in applied:
+                    continue
+                await migration_.apply(conn)
+                await conn.execute(
+                    schema_migrations.insert().values(
+                        version=migration_.version,
+                        description=migration_.description,
+                    )
+                )
+                applied_now.append(migration_)
+        finally:
+            await conn.execute(select(func.pg_advisory_unlock(MIGRATIONS_LOCK_ID)))
+
+    return applied_now
@@ -1,72 +1,200 @@
-from typing import Union, List, Optional, Tuple, TypeVar
+from collections import Counter
+from typing import List, Optional, Tuple, TypeVar, Set, AsyncIterator, Callable
 
 from sqlalchemy.future import select
-from sqlalchemy import update
+from sqlalchemy import update, any_, bindparam, ARRAY, Integer
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from candy_delivery_app.business_models.orders.utils import get_best_orders
-from candy_delivery_app.db.models.utils import check_courier_can_delivery_by_time
-from candy_delivery_app.models.utils import get_timedeltas_from_string
+from candy_delivery_app.business_models.orders.solver import get_best_orders_async
+from candy_delivery_app.db.bulk import CopyImport, copy_insert, get_column_default
+from candy_delivery_app.db.orders_index import orders_index
+from candy_delivery_app.db.models.utils import check_order_can_be_delivered_by_courier
+from candy_delivery_app.models.settings import settings
+from candy_delivery_app.models.utils import (
+    get_timedeltas_from_string,
+    get_minutes_mask_from_timedeltas,
+)
 
 T = TypeVar("T")
 
+# asyncpg не принимает больше 32767 параметров в одном запросе
+MAX_QUERY_ARGS = 32767
+
 
 class BaseDbModel:
     @classmethod
-    def get_items_list_from_json(cls: T, json_data: dict, id_key: str) -> List[T]:
-        items = []
-        for data in json_data["data"]:
+    def prepare_rows(cls: T, json_data: dict, id_key: str) -> List[dict]:
+        # приводит элементы json_data["data"] к колонкам таблицы (на месте)
+        rows = json_data["data"]
+        for data in rows:
             data["id"] = data.pop(id_key)
             if data.get("working_hours"):
                 dates = get_timedeltas_from_string(data["working_hours"])
                 data["working_hours_timedeltas"] = dates
+                data["working_hours_mask"] = get_minutes_mask_from_timedeltas(dates)
             elif data.get("delivery_hours"):
                 dates = get_timedeltas_from_string(data["delivery_hours"])
                 data["delivery_hours_timedeltas"] = dates
-            items.append(cls(**data))
-        return items
+                data["delivery_hours_mask"] = get_minutes_mask_from_timedeltas(dates)
+        return rows
 
     @classmethod
-    async def find_duplicates(
+    async def create(
         cls: T,
         session: AsyncSession,
-        elements: List[T],
-    ) -> List[int]:
-        ids = [element.id for element in elements]
-        old_ids = [
-            data[0]
-            for data in (
-                await session.execute(select(cls.id).where(cls.id.in_(ids)))
-            ).fetchall()
+        json_data: dict,
+        id_key: str,
+    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+        """
+        Вставка с ON CONFLICT DO NOTHING: дубликаты находятся той же командой,
+        без отдельного SELECT и без окна для параллельной выгрузки тех же id.
+        Если хоть одна строка не вставилась, откатываем все.
+        Возвращает id созданных элементов
+        """
+        if len(json_data["data"]) >= settings.bulk_import_min_items:
+            return await cls.bulk_create(
+                session=session, json_data=json_data, id_key=id_key
+            )
+
+        rows = cls.prepare_rows(json_data=json_data, id_key=id_key)
+        columns = list(cls.__table__.columns)
+        # в многострочном VALUES у всех строк должны быть все колонки
+        rows_values = [
+            {
+                column.name: row.get(column.name, get_column_default(column))
+                for column in columns
+            }
+            for row in rows
         ]
-        return old_ids
+
+        inserted_ids = set()
+        chunk_size = MAX_QUERY_ARGS // len(columns)
+        for i in range(0, len(rows_values), chunk_size):
+            inserted_ids.update(
+                (
+                    await session.execute(
+                        insert(cls)
+                        .values(rows_values[i : i + chunk_size])
+                        .on_conflict_do_nothing(index_elements=[cls.id])
+                        .returning(cls.id)
+                    )
+                )
+                .scalars()
+                .all()
+            )
+
+        if len(inserted_ids) < len(rows):
+            await session.rollback()
+            ids_count = Counter(row["id"] for row in rows)
+            return None, [
+                _id
+                for _id in ids_count
+                if _id not in inserted_ids or ids_count[_id] > 1
+            ]
+
+        await session.commit()
+        return [row["id"] for row in rows], None
 
     @classmethod
-    async def create(
+    async def bulk_create(
         cls: T,
         session: AsyncSession,
         json_data: dict,
         id_key: str,
-    ) -> Tuple[Optional[List[Union[T, int]]], Optional[List[int]]]:
-        elements = cls.get_items_list_from_json(json_data=json_data, id_key=id_key)
-        old_ids = await cls.find_duplicates(
+    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+        """
+        Большие выгрузки идут через COPY, ORM-объекты не создаются.
+        Возвращает id созданных элементов
+        """
+        rows = cls.prepare_rows(json_data=json_data, id_key=id_key)
+        old_ids = await copy_insert(
             session=session,
-            elements=elements,
+            table=cls.__table__,
+            rows=rows,
+            chunk_size=settings.bulk_import_chunk_size,
         )
 
         if old_ids:
+            await session.rollback()
             return None, old_ids
 
-        session.add_all(elements)
         await session.commit()
-        return elements, None
+        return [row["id"] for row in rows], None
+
+    @classmethod
+    async def create_from_stream(
+        cls: T,
+        session: AsyncSession,
+        chunks: AsyncIterator[List[dict]],
+        id_key: str,
+        on_rows: Optional[Callable[[List[dict]], None]] = None,
+    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+        """
+        Как bulk_create, но элементы приходят порциями по мере разбора тела
+        запроса и сразу уходят в COPY. on_rows получает каждую порцию строк.
+        Исключение из chunks прерывает выгрузку, откат на вызывающем
+        """
+        copy_import = CopyImport(session=session, table=cls.__table__)
+        await copy_import.start()
+
+        ids = []
+        async for chunk in chunks:
+            rows = cls.prepare_rows(json_data={"data": chunk}, id_key=id_key)
+            await copy_import.copy(rows)
+            ids.extend(row["id"] for row in rows)
+            if on_rows is not None:
+                on_rows(rows)
+
+        old_ids = await copy_import.finish()
+        if old_ids:
+            await session.rollback()
+            return None, old_ids
+
+        await session.commit()
+        return ids, None
 
     @classmethod
     async def get_one(cls: T, session: AsyncSession, _id: int) -> Optional[T]:
         ...
 
+    @classmethod
+    async def get_orders_after_patch(
+        cls: T, new_object: T, changed_keys: Set[str]
+    ) -> List:
+        """
+        Какие из текущих заказов курьер оставит себе после изменения.
+        Проверяется только то, что поменялось
+        """
+        orders = new_object.orders
+        if not orders:
+            return orders
+
+        if "regions" in changed_keys:
+            regions = set(new_object.regions)
+            orders = [order for order in orders if order.region in regions]
+
+        if "working_hours" in changed_keys:
+            orders = [
+                order
+                for order in orders
+                if check_order_can_be_delivered_by_courier(
+                    order_mask=order.delivery_hours_mask,
+                    courier_mask=new_object.working_hours_mask,
+                )
+            ]
+
+        if sum(order.weight for order in orders) > new_object.get_capacity():
+            orders = await get_best_orders_async(
+                sorted(orders, key=lambda order: order.weight),
+                capacity=new_object.get_capacity(),
+            )
+
+        return orders
+
     @classmethod
     async def patch(
         cls: T, session: AsyncSession, _id: int, new_data: dict
@@ -79,63 +207,68 @@ class BaseDbModel:
             if value is None:
                 continue
             if key == "working_hours":
-                update_data["working_hours_timedeltas"] = get_timedeltas_from_string(
-                    value
+                dates = get_timedeltas_from_string(value)
+                update_data["working_hours_timedeltas"] = dates
+                update_data["working_hours_mask"] = get_minutes_mask_from_timedeltas(
+                    dates
                 )
             elif key == "delivery_hours":
-                update_data["delivery_hours_timedeltas"] = get_timedeltas_from_string(
-                    value
+                dates = get_timedeltas_from_string(value)
+                update_data["delivery_hours_timedeltas"] = dates
+                update_data["delivery_hours_mask"] = get_minutes_mask_from_timedeltas(
+                    dates
                 )
 
             update_data[key] = value
 
-        response = await session.execute(
-            update(cls)
-            .where(cls.id == _id)
-            .options(selectinload(cls.orders))
-            .values(update_data)
-            .returning(cls)
-        )
-
-        if not response.fetchall():
-            return None
-
         new_object = (
             await session.execute(
                 select(cls).where(cls.id == _id).options(selectinload(cls.orders))
             )
-        ).first()[0]
+        ).first()
+        if new_object is None:
+            return None
+        new_object = new_object[0]
+
+        changed_keys = {
+            key
+            for key, value in update_data.items()
+            if getattr(new_object, key) != value
+        }
+        for key in changed_keys:
+            setattr(new_object, key, update_data[key])
+        if changed_keys:
+            new_object.bump_version()
 
-        new_object_orders = get_best_orders(
-            new_object.orders, capacity=new_object.get_capacity()
+        new_orders = await cls.get_orders_after_patch(
+            new_object=new_object, changed_keys=changed_keys
         )
+        new_orders_ids = {order.id for order in new_orders}
+        released_orders = [
+            order for order in new_object.orders if order.id not in new_orders_ids
+        ]
 
-        if new_object_orders:
-            new_orders = []
-            orders_sum_weight = 0
-            for order in new_object_orders:
-                for order_timedelta in order.delivery_hours_timedeltas:
-                    for courier_timedelta in new_object.working_hours_timedeltas:
-                        if (
-                            check_courier_can_delivery_by_time(
-                                order_timedelta=order_timedelta,
-                                courier_timedelta=courier_timedelta,
-                            )
-                            and (
-                                round(orders_sum_weight + order.weight, 2)
-                                <= new_object.get_capacity()
-                            )
-                            and (order not in new_orders)
-                            and (order.region in new_object.regions)
-                        ):
-                            orders_sum_weight = round(
-                                orders_sum_weight + order.weight, 2
-                            )
-                            new_orders.append(order)
-            for order in new_object.orders:
-                if order not in new_orders:
-                    order.assign_time = None
-                    order.courier_id = None
+        if released_orders:
+            order_model = cls.orders.property.mapper.class_
+            await session.execute(
+                update(order_model)
+                .where(
+                    order_model.id
+                    == any_(
+                        bindparam(
+                            "released_ids",
+                            [order.id for order in released_orders],
+                            type_=ARRAY(Integer),
+                        )
+                    )
+                )
+                .values({"courier_id": None, "assign_time": None})
+                .execution_options(synchronize_session=False)
+            )
 
         await session.commit()
+
+        if released_orders:
+            set_committed_value(new_object, "orders", new_orders)
+            orders_index.add(order.to_free_order() for order in released_orders)
         return new_object
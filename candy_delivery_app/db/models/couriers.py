@@ -1,4 +1,5 @@
-from typing import Optional, List, Tuple, Union
+import enum
+from typing import Optional, List, Tuple, AsyncIterator
 
 from sqlalchemy import (
     Column,
@@ -8,25 +9,46 @@ from sqlalchemy import (
     FLOAT,
     JSON,
     String,
+    Index,
+    func,
 )
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.future import select
 from sqlalchemy.engine import Row
+from sqlalchemy.sql.elements import ClauseElement
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import relationship, selectinload
 
 from .base import BaseDbModel
+from .utils import MinutesMask
+from ..couriers_cache import couriers_cache
 from ..db import Base
 from ...models.couriers import CourierType
 
+# первый ключ advisory-блокировок курьеров, чтобы не пересекаться с другими
+COURIER_LOCK_NAMESPACE = 1
+
+
+class CourierLoading(str, enum.Enum):
+    # только колонки курьера
+    SCALARS = "scalars"
+    # плюс active_orders_ids и active_assign_time текущих заказов,
+    # тем же запросом
+    ACTIVE_ORDERS = "active_orders"
+    # плюс ORM-объекты заказов в orders, вторым запросом
+    FULL = "full"
+
 
 class Courier(Base, BaseDbModel):
     __tablename__ = "couriers"
+    __table_args__ = (Index("ix_couriers_regions", "regions", postgresql_using="gin"),)
 
     id = Column(Integer, primary_key=True)
     courier_type = Column(Enum(CourierType))
     regions = Column(ARRAY(Integer))
     working_hours = Column(ARRAY(String))
     working_hours_timedeltas = Column(ARRAY(JSON))
+    working_hours_mask = Column(MinutesMask, default=0)
 
     orders = relationship("Order", backref="courier")
 
@@ -34,7 +56,12 @@ class Courier(Base, BaseDbModel):
     earnings = Column(Integer, default=0)
 
     last_delivery_time = Column(FLOAT, nullable=True)
-    delivery_data = Column(JSON, nullable=True)
+    # номер текущего развоза, растет при его завершении. Сами доставки -
+    # в deliveries, итоги по районам - в courier_region_stats
+    bag_id = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # растет при изменении, назначении и завершении заказов, отдается как ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
 
     def get_capacity(self):
         return {
@@ -53,54 +80,114 @@ class Courier(Base, BaseDbModel):
     @classmethod
     async def create_couriers(
         cls, session: AsyncSession, json_data: dict
-    ) -> Tuple[Optional[List[Union["Courier", int]]], Optional[List[int]]]:
+    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
         return await cls.create(
             session=session, json_data=json_data, id_key="courier_id"
         )
 
     @classmethod
-    async def get_one(cls, session: AsyncSession, _id: int) -> Optional["Courier"]:
-        result = (
-            await session.execute(
-                select(cls).where(cls.id == _id).options(selectinload(cls.orders))
+    async def create_couriers_from_stream(
+        cls, session: AsyncSession, chunks: AsyncIterator[List[dict]]
+    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+        return await cls.create_from_stream(
+            session=session, chunks=chunks, id_key="courier_id"
+        )
+
+    @classmethod
+    async def lock(cls, session: AsyncSession, courier_id: int) -> None:
+        """
+        Блокировка курьера до конца транзакции. Назначение, изменение и
+        завершение заказов одного курьера выполняются строго по очереди,
+        в том числе между разными воркерами gunicorn.
+        """
+        await session.execute(
+            select(func.pg_advisory_xact_lock(COURIER_LOCK_NAMESPACE, courier_id))
+        )
+
+    @classmethod
+    async def load(
+        cls, session: AsyncSession, where: ClauseElement, loading: CourierLoading
+    ) -> List["Courier"]:
+        if loading == CourierLoading.FULL:
+            query = select(cls).options(selectinload(cls.orders))
+        elif loading == CourierLoading.ACTIVE_ORDERS:
+            order = cls.orders.property.mapper.class_
+            query = select(
+                cls,
+                select(func.array_agg(aggregate_order_by(order.id, order.id)))
+                .where(order.courier_id == cls.id)
+                .scalar_subquery(),
+                select(func.min(order.assign_time))
+                .where(order.courier_id == cls.id)
+                .scalar_subquery(),
             )
-        ).first()
-        return result[0] if result is not None else result
+        else:
+            query = select(cls)
+
+        couriers = []
+        for row in (await session.execute(query.where(where))).fetchall():
+            courier = row[0]
+            if loading == CourierLoading.ACTIVE_ORDERS:
+                courier.active_orders_ids = row[1] or []
+                courier.active_assign_time = row[2]
+            couriers.append(courier)
+        return couriers
 
     @classmethod
-    async def get_courier(
-        cls, session: AsyncSession, courier_id: int
+    async def get_one(
+        cls,
+        session: AsyncSession,
+        _id: int,
+        loading: CourierLoading = CourierLoading.FULL,
     ) -> Optional["Courier"]:
-        return await cls.get_one(session=session, _id=courier_id)
+        couriers = await cls.load(session=session, where=cls.id == _id, loading=loading)
+        return couriers[0] if couriers else None
 
     @classmethod
-    async def get_all_data_courier(
-        cls, session: AsyncSession, courier_id: int
+    async def get_courier(
+        cls,
+        session: AsyncSession,
+        courier_id: int,
+        loading: CourierLoading = CourierLoading.FULL,
     ) -> Optional["Courier"]:
-        base_courier = await cls.get_courier(session=session, courier_id=courier_id)
-        if base_courier is None:
-            return base_courier
-
-        average_values = []
+        return await cls.get_one(session=session, _id=courier_id, loading=loading)
 
-        if base_courier.delivery_data is None:
-            return base_courier
-
-        for region, times in base_courier.delivery_data["regions"].items():
-            average_values.append(sum(times) / len(times))
+    @classmethod
+    async def get_couriers(
+        cls,
+        session: AsyncSession,
+        couriers_ids: List[int],
+        loading: CourierLoading = CourierLoading.FULL,
+    ) -> List["Courier"]:
+        return await cls.load(
+            session=session, where=cls.id.in_(couriers_ids), loading=loading
+        )
 
-        if not average_values:
-            return base_courier
+    @classmethod
+    async def get_version(cls, session: AsyncSession, courier_id: int) -> Optional[int]:
+        return (
+            await session.execute(select(cls.version).where(cls.id == courier_id))
+        ).scalar()
 
-        t = min(average_values)
+    def bump_version(self) -> None:
+        # вызывается под блокировкой курьера (Courier.lock)
+        self.version += 1
 
-        rating = (60 * 60 - min(t, 60 * 60)) / (60 * 60) * 5
-        base_courier.rating = round(rating, 2)
-        await session.commit()
-        return base_courier
+    @classmethod
+    async def get_all_data_courier(
+        cls, session: AsyncSession, courier_id: int
+    ) -> Optional["Courier"]:
+        # рейтинг пересчитывается при завершении развоза (COMPLETE_ORDER_QUERY),
+        # чтение ничего не пишет
+        return await cls.get_courier(
+            session=session, courier_id=courier_id, loading=CourierLoading.SCALARS
+        )
 
     @classmethod
     async def patch_courier(
         cls, session: AsyncSession, courier_id: int, new_data: dict
     ) -> Row:
-        return await cls.patch(session=session, _id=courier_id, new_data=new_data)
+        await cls.lock(session=session, courier_id=courier_id)
+        courier = await cls.patch(session=session, _id=courier_id, new_data=new_data)
+        couriers_cache.invalidate([courier_id])
+        return courier
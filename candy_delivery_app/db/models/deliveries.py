@@ -0,0 +1,130 @@
+import datetime
+from typing import List
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    FLOAT,
+    DateTime,
+    ForeignKey,
+    Index,
+    func,
+    text,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.future import select
+
+from ..db import Base, engine
+from ...models.settings import settings
+
+# advisory-блокировка создания секций, чтобы воркеры не создавали их наперегонки
+DELIVERIES_PARTITIONS_LOCK_ID = 3
+
+
+class Delivery(Base):
+    """
+    Завершенная доставка - одна строка, только добавление. Таблица разбита
+    на месячные секции по completed_at, строки вне созданных секций попадают
+    в deliveries_default
+    """
+
+    __tablename__ = "deliveries"
+    __table_args__ = (
+        # доставки текущего развоза курьера при его завершении
+        Index("ix_deliveries_courier_bag", "courier_id", "bag_id"),
+        {"postgresql_partition_by": "RANGE (completed_at)"},
+    )
+
+    order_id = Column(Integer, primary_key=True)
+    completed_at = Column(DateTime(timezone=True), primary_key=True)
+    courier_id = Column(Integer, nullable=False)
+    region = Column(Integer, nullable=False)
+    # номер развоза курьера (Courier.bag_id на момент доставки)
+    bag_id = Column(Integer, nullable=False)
+    # секунды от прошлой доставки курьера, для первой - от назначения
+    duration = Column(FLOAT, nullable=False)
+
+    @staticmethod
+    def get_partition_name(month: datetime.date) -> str:
+        return f"deliveries_y{month.year}m{month.month:02d}"
+
+    @classmethod
+    async def create_partitions(
+        cls, conn: AsyncConnection, today: datetime.date, months_ahead: int
+    ) -> List[str]:
+        """
+        Секции на текущий месяц и months_ahead следующих. Месяц, строки
+        которого уже лежат в deliveries_default, пропускается: PostgreSQL
+        не даст создать для него секцию
+        """
+        await conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS deliveries_default "
+                "PARTITION OF deliveries DEFAULT"
+            )
+        )
+
+        created = []
+        month = today.replace(day=1)
+        for _ in range(months_ahead + 1):
+            next_month = (month + datetime.timedelta(days=32)).replace(day=1)
+            name = cls.get_partition_name(month)
+            bounds = {
+                "start": datetime.datetime.combine(
+                    month, datetime.time(), tzinfo=datetime.timezone.utc
+                ),
+                "end": datetime.datetime.combine(
+                    next_month, datetime.time(), tzinfo=datetime.timezone.utc
+                ),
+            }
+            exists = (
+                await conn.execute(select(func.to_regclass(name).isnot(None)))
+            ).scalar()
+            in_default = (
+                await conn.execute(
+                    text(
+                        "SELECT EXISTS (SELECT 1 FROM deliveries_default "
+                        "WHERE completed_at >= :start AND completed_at < :end)"
+                    ),
+                    bounds,
+                )
+            ).scalar()
+            if not exists and not in_default:
+                await conn.execute(
+                    text(
+                        f"CREATE TABLE {name} PARTITION OF deliveries FOR VALUES "
+                        f"FROM ('{bounds['start'].isoformat()}') "
+                        f"TO ('{bounds['end'].isoformat()}')"
+                    )
+                )
+                created.append(name)
+            month = next_month
+
+        return created
+
+    @classmethod
+    async def ensure_partitions(cls) -> List[str]:
+        # при старте приложения, секции на deliveries_partitions_ahead месяцев
+        async with engine.begin() as conn:
+            await conn.execute(
+                select(func.pg_advisory_xact_lock(DELIVERIES_PARTITIONS_LOCK_ID))
+            )
+            return await cls.create_partitions(
+                conn,
+                today=datetime.datetime.utcnow().date(),
+                months_ahead=settings.deliveries_partitions_ahead,
+            )
+
+
+class CourierRegionStats(Base):
+    """
+    Итоги завершенных развозов курьера по району: число доставок и их
+    суммарное время. Обновляются только при завершении развоза
+    """
+
+    __tablename__ = "courier_region_stats"
+
+    courier_id = Column(Integer, ForeignKey("couriers.id"), primary_key=True)
+    region = Column(Integer, primary_key=True)
+    deliveries = Column(Integer, nullable=False)
+    total_time = Column(FLOAT, nullable=False)
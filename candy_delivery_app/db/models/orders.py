@@ -1,5 +1,15 @@
 import datetime
-from typing import Optional, List, Tuple, Union
+from functools import reduce
+from operator import or_
+from typing import (
+    Optional,
+    List,
+    Tuple,
+    Dict,
+    Iterable,
+    Set,
+    AsyncIterator,
+)
 
 from aiohttp import web
 from sqlalchemy import Column, Integer, ARRAY
@@ -12,28 +22,148 @@ from sqlalchemy import (
     ForeignKey,
     update,
     Boolean,
+    Index,
     not_,
+    text,
 )
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from sqlalchemy.sql.operators import is_
-from dateutil import parser
 
 from .base import BaseDbModel
-from .couriers import Courier
-from .utils import check_courier_can_delivery_by_time
+from .couriers import Courier, CourierLoading
+from .utils import check_order_can_be_delivered_by_courier, MinutesMask
 from ..db import Base
-from ...business_models.orders.utils import get_best_orders
+from ..couriers_cache import couriers_cache
+from ..orders_index import FreeOrder, orders_index
+from ...business_models.orders.solver import get_best_orders_async
+
+# сколько раз пересчитывать рюкзак, если выбранные заказы забрали другие курьеры
+MAX_CLAIM_ATTEMPTS = 3
+
+# Завершение заказа одним запросом: проверка, что заказ назначен курьеру,
+# отметка о завершении, заработок и строка в deliveries. Время доставки
+# считается от прошлой доставки курьера, а для первой - от назначения.
+# С последним заказом развоза его доставки (по ix_deliveries_courier_bag)
+# добавляются к итогам courier_region_stats, номер развоза курьера растет
+# и пересчитывается рейтинг: по среднему времени в самом быстром районе,
+# 5 - мгновенно, 0 - час и дольше. Завершен ли развоз, проверяет индекс
+# ix_orders_courier_id. Последний SELECT видит заказ до изменения - по нему
+# отличаем повторное завершение от ошибки
+COMPLETE_ORDER_QUERY = text("""
+    WITH target AS (
+        SELECT id, courier_id, cost, region, assign_time
+        FROM orders
+        WHERE id = :order_id AND courier_id = :courier_id AND NOT completed
+    ),
+    delivery AS (
+        SELECT
+            t.id AS order_id,
+            c.id AS courier_id,
+            c.bag_id,
+            t.cost,
+            t.region,
+            :complete_ts - coalesce(
+                c.last_delivery_time,
+                round(extract(epoch FROM t.assign_time::timestamptz) * 1000000)
+                    ::int8::float8 / 1000000
+            ) AS duration,
+            NOT EXISTS (
+                SELECT 1 FROM orders o WHERE o.courier_id = c.id AND o.id <> t.id
+            ) AS bag_finished
+        FROM couriers c JOIN target t ON t.courier_id = c.id
+    ),
+    completed_order AS (
+        UPDATE orders
+        SET
+            completed = true,
+            courier_id = NULL,
+            old_courier_id = target.courier_id,
+            completed_time = :completed_time
+        FROM target
+        WHERE orders.id = target.id
+    ),
+    fact AS (
+        INSERT INTO deliveries (
+            order_id, completed_at, courier_id, region, bag_id, duration
+        )
+        SELECT order_id, to_timestamp(:complete_ts), courier_id, region, bag_id, duration
+        FROM delivery
+    ),
+    bag_stats AS (
+        INSERT INTO courier_region_stats AS s (
+            courier_id, region, deliveries, total_time
+        )
+        SELECT bag.courier_id, bag.region, count(*), sum(bag.duration)
+        FROM (
+            SELECT d.courier_id, d.region, d.duration
+            FROM deliveries d JOIN delivery USING (courier_id, bag_id)
+            UNION ALL
+            SELECT courier_id, region, duration FROM delivery
+        ) bag
+        WHERE (SELECT bag_finished FROM delivery)
+        GROUP BY bag.courier_id, bag.region
+        ON CONFLICT (courier_id, region) DO UPDATE SET
+            deliveries = s.deliveries + excluded.deliveries,
+            total_time = s.total_time + excluded.total_time
+        RETURNING s.region, s.total_time / s.deliveries AS avg_time
+    ),
+    updated_courier AS (
+        UPDATE couriers
+        SET
+            earnings = couriers.earnings + d.cost,
+            last_delivery_time = :complete_ts,
+            bag_id = couriers.bag_id + d.bag_finished::int,
+            rating = CASE WHEN d.bag_finished THEN (
+                SELECT round(((3600 - least(min(a.avg_time), 3600)) / 3600 * 5)::numeric, 2)
+                FROM (
+                    SELECT avg_time FROM bag_stats
+                    UNION ALL
+                    SELECT s.total_time / s.deliveries
+                    FROM courier_region_stats s
+                    WHERE s.courier_id = d.courier_id
+                        AND s.region NOT IN (SELECT region FROM bag_stats)
+                ) a
+            ) ELSE couriers.rating END,
+            version = couriers.version + 1
+        FROM delivery d
+        WHERE couriers.id = d.courier_id
+        RETURNING couriers.id
+    )
+    SELECT
+        courier_id,
+        old_courier_id,
+        completed,
+        completed_time,
+        EXISTS (SELECT 1 FROM updated_courier) AS done
+    FROM orders
+    WHERE id = :order_id
+    """)
 
 
 class Order(Base, BaseDbModel):
     __tablename__ = "orders"
+    # индексы на существующие базы накатываются миграциями (db/migrations.py)
+    __table_args__ = (
+        Index(
+            "ix_orders_delivery_hours_mask",
+            "delivery_hours_mask",
+            postgresql_using="gist",
+        ),
+        Index(
+            "ix_orders_free_region_weight",
+            "region",
+            "weight",
+            postgresql_where=text("NOT completed AND courier_id IS NULL"),
+        ),
+        Index("ix_orders_courier_id", "courier_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     weight = Column(Float)
     region = Column(Integer)
     delivery_hours = Column(ARRAY(String))
     delivery_hours_timedeltas = Column(ARRAY(JSON))
+    delivery_hours_mask = Column(MinutesMask, default=0)
     assign_time = Column(String, nullable=True)
     completed = Column(Boolean, default=False)
 
@@ -46,8 +176,30 @@ class Order(Base, BaseDbModel):
     @classmethod
     async def create_orders(
         cls, session: AsyncSession, json_data: dict
-    ) -> Tuple[Optional[List[Union["Order", int]]], Optional[List[int]]]:
-        return await cls.create(session=session, json_data=json_data, id_key="order_id")
+    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+        orders, errors_ids = await cls.create(
+            session=session, json_data=json_data, id_key="order_id"
+        )
+        if orders is not None:
+            orders_index.add(cls.row_to_free_order(data) for data in json_data["data"])
+        return orders, errors_ids
+
+    @classmethod
+    async def create_orders_from_stream(
+        cls, session: AsyncSession, chunks: AsyncIterator[List[dict]]
+    ) -> Tuple[Optional[List[int]], Optional[List[int]]]:
+        free_orders = []
+
+        def on_rows(rows: List[dict]) -> None:
+            if orders_index.enabled:
+                free_orders.extend(cls.row_to_free_order(data) for data in rows)
+
+        orders, errors_ids = await cls.create_from_stream(
+            session=session, chunks=chunks, id_key="order_id", on_rows=on_rows
+        )
+        if orders is not None:
+            orders_index.add(free_orders)
+        return orders, errors_ids
 
     @classmethod
     async def get_one(cls, session: AsyncSession, _id: int) -> Optional["Order"]:
@@ -55,154 +207,366 @@ class Order(Base, BaseDbModel):
         return result[0] if result is not None else result
 
     @classmethod
-    async def get_orders_for_courier(
-        cls, session: AsyncSession, courier_id: int
-    ) -> Tuple[str, List["Order"]]:
-
-        courier = await Courier.get_courier(courier_id=courier_id, session=session)
-        if courier is None:
-            raise web.HTTPBadRequest
-
-        if not courier.regions or not courier.working_hours:
-            return "", []
+    async def get_available_orders(
+        cls,
+        session: AsyncSession,
+        regions: Iterable[int],
+        max_weight: int,
+        hours_mask: int,
+    ) -> List[FreeOrder]:
+        if orders_index.enabled:
+            return orders_index.get_orders(
+                regions=regions, max_weight=max_weight, hours_mask=hours_mask
+            )
 
         orders = await session.execute(
-            select(Order)
+            select(Order.id, Order.weight, Order.region, Order.delivery_hours_mask)
             .filter(
                 and_(
-                    Order.region.in_(courier.regions),
+                    Order.region.in_(regions),
                     not_(Order.completed),
-                    Order.weight <= courier.get_capacity(),
+                    Order.weight <= max_weight,
                     is_(Order.courier_id, None),
+                    Order.delivery_hours_mask.overlaps(hours_mask),
                 )
             )
             .order_by(Order.weight)
         )
+        return [FreeOrder(*order) for order in orders.fetchall()]
+
+    @classmethod
+    async def rebuild_orders_index(cls, session: AsyncSession) -> None:
+        orders = await session.execute(
+            select(
+                Order.id, Order.weight, Order.region, Order.delivery_hours_mask
+            ).filter(and_(not_(Order.completed), is_(Order.courier_id, None)))
+        )
+        orders_index.rebuild(FreeOrder(*order) for order in orders.fetchall())
+
+    def to_free_order(self) -> FreeOrder:
+        return FreeOrder(
+            id=self.id,
+            weight=self.weight,
+            region=self.region,
+            delivery_hours_mask=self.delivery_hours_mask,
+        )
+
+    @staticmethod
+    def row_to_free_order(data: dict) -> FreeOrder:
+        # строка, подготовленная prepare_rows, ORM-объектов при выгрузке нет
+        return FreeOrder(
+            id=data["id"],
+            weight=data["weight"],
+            region=data["region"],
+            delivery_hours_mask=data.get("delivery_hours_mask", 0),
+        )
+
+    @staticmethod
+    def get_assign_time() -> str:
+        return datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+
+    @classmethod
+    async def claim_orders(
+        cls, session: AsyncSession, orders_ids: Iterable[int]
+    ) -> Set[int]:
+        """
+        Блокирует свободные заказы до конца транзакции. Заказы, которые прямо
+        сейчас забирает другая транзакция, пропускаются, а не ждут ее
+        """
+        orders_ids = list(orders_ids)
+        if not orders_ids:
+            return set()
+
+        result = await session.execute(
+            select(Order.id)
+            .where(
+                and_(
+                    Order.id.in_(orders_ids),
+                    not_(Order.completed),
+                    is_(Order.courier_id, None),
+                )
+            )
+            .with_for_update(skip_locked=True)
+        )
+        return {order_id for (order_id,) in result.fetchall()}
+
+    @classmethod
+    async def assign_best_orders(
+        cls,
+        session: AsyncSession,
+        courier: Courier,
+        orders: List[FreeOrder],
+        assign_time: str,
+    ) -> List[FreeOrder]:
+        """
+        orders должны быть отсортированы по весу
+        """
+        regions = set(courier.regions)
+        # рюкзак получает только те заказы, которые курьер успеет доставить
+        available_orders = [
+            order
+            for order in orders
+            if order.region in regions
+            and order.weight <= courier.get_capacity()
+            and check_order_can_be_delivered_by_courier(
+                order_mask=order.delivery_hours_mask,
+                courier_mask=courier.working_hours_mask,
+            )
+        ]
+
+        good_orders = await get_best_orders_async(
+            available_orders, capacity=courier.get_capacity()
+        )
+
+        # кандидаты читаются без блокировок, блокируются только выбранные
+        # заказы. Если часть из них уже забрал другой курьер, блокировки этой
+        # попытки отпускаются (откат к точке сохранения) и рюкзак считается
+        # заново без забранных заказов. Последняя попытка оставляет то, что
+        # удалось заблокировать - лишних заблокированных заказов не бывает
+        unavailable_ids = set()
+        for attempt in range(MAX_CLAIM_ATTEMPTS):
+            orders_ids = {order.id for order in good_orders}
+            if not orders_ids:
+                break
+
+            savepoint = await session.begin_nested()
+            claimed_ids = await cls.claim_orders(session=session, orders_ids=orders_ids)
+            if claimed_ids == orders_ids or attempt == MAX_CLAIM_ATTEMPTS - 1:
+                await savepoint.commit()
+                good_orders = [
+                    order for order in good_orders if order.id in claimed_ids
+                ]
+                break
+
+            await savepoint.rollback()
+            unavailable_ids |= orders_ids - claimed_ids
+            good_orders = await get_best_orders_async(
+                [
+                    order
+                    for order in available_orders
+                    if order.id not in unavailable_ids
+                ],
+                capacity=courier.get_capacity(),
+            )
+
+        if good_orders:
+            await session.execute(
+                update(Order)
+                .where(Order.id.in_([order.id for order in good_orders]))
+                .values(
+                    {
+                        "cost": 500 * courier.get_coefficient(),
+                        "courier_id": courier.id,
+                        "assign_time": assign_time,
+                    }
+                )
+                .execution_options(synchronize_session=False)
+            )
 
-        good_orders = []
-        orders_sum_weight = 0
+        return good_orders
 
-        if courier.orders:
-            return courier.orders[0].assign_time, courier.orders
+    @classmethod
+    async def get_orders_for_courier(
+        cls, session: AsyncSession, courier_id: int
+    ) -> Tuple[str, List[int]]:
 
-        raw_orders = get_best_orders(
-            [raw_order[0] for raw_order in orders.fetchall()],
-            capacity=courier.get_capacity(),
+        await Courier.lock(session=session, courier_id=courier_id)
+        courier = await Courier.get_courier(
+            courier_id=courier_id,
+            session=session,
+            loading=CourierLoading.ACTIVE_ORDERS,
         )
+        if courier is None:
+            raise web.HTTPBadRequest
 
-        assign_time = (
-            datetime.datetime.utcnow().isoformat(timespec="milliseconds") + "Z"
+        if not courier.regions or not courier.working_hours:
+            return "", []
+
+        if courier.active_orders_ids:
+            return courier.active_assign_time, courier.active_orders_ids
+
+        orders = await cls.get_available_orders(
+            session=session,
+            regions=courier.regions,
+            max_weight=courier.get_capacity(),
+            hours_mask=courier.working_hours_mask,
         )
 
-        for order in raw_orders:
-            for order_timedelta in order.delivery_hours_timedeltas:
-                for courier_timedelta in courier.working_hours_timedeltas:
-                    if (
-                        check_courier_can_delivery_by_time(
-                            order_timedelta=order_timedelta,
-                            courier_timedelta=courier_timedelta,
-                        )
-                        and (order not in good_orders)
-                        and (
-                            round(orders_sum_weight + order.weight, 2)
-                            <= courier.get_capacity()
-                        )
-                    ):
-                        orders_sum_weight = round(orders_sum_weight + order.weight, 2)
-                        order.cost = 500 * courier.get_coefficient()
-                        order.courier_id = courier.id
-                        order.assign_time = assign_time
-                        good_orders.append(order)
+        assign_time = cls.get_assign_time()
+        good_orders = await cls.assign_best_orders(
+            session=session, courier=courier, orders=orders, assign_time=assign_time
+        )
 
         if not good_orders:
             return assign_time, []
 
-        session.add_all(good_orders)
+        courier.bump_version()
         await session.commit()
-        return assign_time, good_orders
+        orders_ids = [order.id for order in good_orders]
+        orders_index.discard(orders_ids)
+        couriers_cache.invalidate([courier_id])
+        return assign_time, orders_ids
 
     @classmethod
-    async def complete_order(
-        cls, session: AsyncSession, order_id: int, complete_time: datetime.datetime
-    ) -> None:
-        order = (
-            await session.execute(
-                select(Order)
-                .where(Order.id == order_id)
-                .options(selectinload(Order.courier))
-            )
-        ).fetchall()[0][0]
-        if order.courier is None:
-            return
+    async def complete_orders(
+        cls,
+        session: AsyncSession,
+        completions: List[Tuple[int, int, datetime.datetime]],
+    ) -> List[bool]:
+        """
+        Пакетное завершение (order_id, courier_id, complete_time) одной
+        транзакцией. Заказы завершаются по возрастанию complete_time,
+        результаты возвращаются в порядке completions
+        """
+        couriers_ids = {courier_id for _, courier_id, _ in completions}
+        for courier_id in sorted(couriers_ids):
+            await Courier.lock(session=session, courier_id=courier_id)
 
-        courier = (
-            await session.execute(
-                select(Courier)
-                .where(Courier.id == order.courier_id)
-                .options(selectinload(Courier.orders))
+        results = [False] * len(completions)
+        for i in sorted(
+            range(len(completions)), key=lambda i: completions[i][2].timestamp()
+        ):
+            order_id, courier_id, complete_time = completions[i]
+            results[i] = await cls.complete(
+                session=session,
+                order_id=order_id,
+                courier_id=courier_id,
+                complete_time=complete_time,
             )
-        ).fetchall()[0][0]
 
-        order.courier.earnings += order.cost
+        await session.commit()
+        orders_index.discard(
+            [order_id for (order_id, _, _), ok in zip(completions, results) if ok]
+        )
+        couriers_cache.invalidate(couriers_ids)
+        return results
 
-        if order.courier.delivery_data is None:
-            order.courier.delivery_data = {"regions": {}, "not_completed_regions": {}}
+    @classmethod
+    async def get_orders_for_couriers(
+        cls, session: AsyncSession, couriers_ids: List[int]
+    ) -> Dict[int, Tuple[str, List[int]]]:
+        """
+        Раздача заказов сразу нескольким курьерам: общий пул заказов
+        читается одним запросом, все назначения сохраняются одним коммитом.
 
-        complete_time_seconds = complete_time.timestamp()
-        if order.courier.last_delivery_time is None:
-            delivery_time = (
-                complete_time_seconds - parser.isoparse(order.assign_time).timestamp()
-            )
-            order.courier.last_delivery_time = complete_time_seconds
-        else:
-            delivery_time = complete_time_seconds - order.courier.last_delivery_time
-            order.courier.last_delivery_time = complete_time_seconds
-
-        # 1616434714.838184
-        region_key = str(order.region)
-
-        if len(courier.orders) > 1:
-            if (
-                order.courier.delivery_data["not_completed_regions"].get(region_key)
-                is None
-            ):
-                order.courier.delivery_data["not_completed_regions"][region_key] = [
-                    delivery_time
-                ]
-            else:
-                order.courier.delivery_data["not_completed_regions"][region_key].append(
-                    delivery_time
+        Совместной оптимизации по всем курьерам нет (это задача о нескольких
+        рюкзаках, NP-трудная): пул раздается жадно, курьерам по очереди от
+        меньшей грузоподъемности к большей, каждому - рюкзак одного курьера
+        из get_best_orders по оставшимся заказам. Суммарный вес может
+        получиться меньше оптимального, зато время как у N обычных назначений.
+        """
+        for courier_id in sorted(set(couriers_ids)):
+            await Courier.lock(session=session, courier_id=courier_id)
+
+        couriers = await Courier.get_couriers(
+            session=session,
+            couriers_ids=couriers_ids,
+            loading=CourierLoading.ACTIVE_ORDERS,
+        )
+        if len(couriers) != len(set(couriers_ids)):
+            raise web.HTTPBadRequest
+
+        result = {}
+        free_couriers = []
+        for courier in couriers:
+            if not courier.regions or not courier.working_hours:
+                result[courier.id] = "", []
+            elif courier.active_orders_ids:
+                result[courier.id] = (
+                    courier.active_assign_time,
+                    courier.active_orders_ids,
                 )
-        else:
-            for k, v in order.courier.delivery_data["not_completed_regions"].items():
-                if order.courier.delivery_data["regions"].get(k) is None:
-                    order.courier.delivery_data["regions"][k] = v
-                else:
-                    order.courier.delivery_data["regions"][k].extend(v)
-
-            if order.courier.delivery_data["regions"].get(region_key) is None:
-                order.courier.delivery_data["regions"][region_key] = [delivery_time]
             else:
-                order.courier.delivery_data["regions"][region_key].append(delivery_time)
+                free_couriers.append(courier)
+
+        if not free_couriers:
+            return result
+
+        orders = await cls.get_available_orders(
+            session=session,
+            regions={region for courier in free_couriers for region in courier.regions},
+            max_weight=max(courier.get_capacity() for courier in free_couriers),
+            hours_mask=reduce(
+                or_, (courier.working_hours_mask for courier in free_couriers)
+            ),
+        )
 
-            order.courier.delivery_data["not_completed_regions"] = {}
+        # сначала выбирают курьеры с меньшей грузоподъемностью - тяжелые
+        # заказы им все равно не подходят и достанутся машинам
+        assign_time = cls.get_assign_time()
+        assigned_ids = set()
+        for courier in sorted(free_couriers, key=lambda c: c.get_capacity()):
+            good_orders = await cls.assign_best_orders(
+                session=session,
+                courier=courier,
+                orders=[order for order in orders if order.id not in assigned_ids],
+                assign_time=assign_time,
+            )
+            orders_ids = [order.id for order in good_orders]
+            if orders_ids:
+                courier.bump_version()
+            assigned_ids.update(orders_ids)
+            result[courier.id] = assign_time, orders_ids
+
+        await session.commit()
+        orders_index.discard(assigned_ids)
+        couriers_cache.invalidate(result)
+        return result
 
-        # работай пж
-        await session.execute(
-            update(Order)
-            .where(Order.id == order_id)
-            .values(
+    @classmethod
+    async def complete(
+        cls,
+        session: AsyncSession,
+        order_id: int,
+        courier_id: int,
+        complete_time: datetime.datetime,
+    ) -> bool:
+        """
+        Завершает заказ одним запросом (COMPLETE_ORDER_QUERY), без коммита,
+        вызывается под блокировкой курьера. False - заказ не найден, не
+        назначен этому курьеру или уже завершен им же, но в другое время
+        """
+        completed_time = complete_time.isoformat()
+        row = (
+            await session.execute(
+                COMPLETE_ORDER_QUERY,
                 {
-                    "completed": True,
-                    "courier_id": None,
-                    "old_courier_id": order.courier.id,
-                    "completed_time": complete_time.isoformat(),
-                }
+                    "order_id": order_id,
+                    "courier_id": courier_id,
+                    "complete_ts": complete_time.timestamp(),
+                    "completed_time": completed_time,
+                },
             )
+        ).first()
+        if row is None:
+            return False
+        if row.done:
+            return True
+
+        # повторное завершение того же заказа - ничего не меняем
+        return (
+            row.completed
+            and row.old_courier_id == courier_id
+            and row.completed_time == completed_time
         )
-        await session.execute(
-            update(Courier)
-            .where(Courier.id == order.courier.id)
-            .values({"delivery_data": order.courier.delivery_data})
-        )
+
+    @classmethod
+    async def complete_order(
+        cls,
+        session: AsyncSession,
+        order_id: int,
+        courier_id: int,
+        complete_time: datetime.datetime,
+    ) -> bool:
+        if not await cls.complete(
+            session=session,
+            order_id=order_id,
+            courier_id=courier_id,
+            complete_time=complete_time,
+        ):
+            return False
+
         await session.commit()
+        orders_index.discard([order_id])
+        couriers_cache.invalidate([courier_id])
+        return True
@@ -1,21 +1,60 @@
-from typing import Dict
-
-
-def check_courier_can_delivery_by_time(
-    order_timedelta: Dict[str, int], courier_timedelta: Dict[str, int]
-):
-    order_first_time, order_second_time = (
-        order_timedelta["first_time"],
-        order_timedelta["second_time"],
-    )
-    courier_first_time, courier_second_time = (
-        courier_timedelta["first_time"],
-        courier_timedelta["second_time"],
-    )
-
-    latest_start = max(order_first_time, courier_first_time)
-    earliest_end = min(order_second_time, courier_second_time)
-    if latest_start < earliest_end:
-        return True
-
-    return False
+import re
+from typing import Optional
+
+from sqlalchemy import Boolean, Text, cast, type_coerce
+from sqlalchemy.types import UserDefinedType
+
+from candy_delivery_app.models.utils import (
+    get_minutes_mask_from_ranges,
+    get_minutes_ranges_from_mask,
+)
+
+multirange_re = re.compile(r"\[(\d+),(\d+)\)")
+
+
+class MinutesMask(UserDefinedType):
+    """
+    Маска минут суток: бит i выставлен, если минута i входит в один из
+    промежутков. В питоне это int, в базе - INT4MULTIRANGE из тех же
+    промежутков, чтобы пересечение (&&) можно было искать по GiST индексу.
+    Нужен PostgreSQL 14+
+    """
+
+    cache_ok = True
+
+    class comparator_factory(UserDefinedType.Comparator):
+        def overlaps(self, other):
+            return self.op("&&", return_type=Boolean)(type_coerce(other, self.type))
+
+    def get_col_spec(self, **kw):
+        return "INT4MULTIRANGE"
+
+    # asyncpg не умеет в multirange, поэтому гоняем значения текстом
+    def bind_expression(self, bindvalue):
+        return cast(cast(bindvalue, Text), self)
+
+    def column_expression(self, col):
+        return type_coerce(cast(col, Text), self)
+
+    def bind_processor(self, dialect):
+        def process(value: Optional[int]) -> Optional[str]:
+            if value is None:
+                return value
+            ranges = get_minutes_ranges_from_mask(value)
+            return "{" + ",".join(f"[{start},{end})" for start, end in ranges) + "}"
+
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value: Optional[str]) -> Optional[int]:
+            if value is None:
+                return value
+            return get_minutes_mask_from_ranges(
+                [(int(start), int(end)) for start, end in multirange_re.findall(value)]
+            )
+
+        return process
+
+
+def check_order_can_be_delivered_by_courier(order_mask: int, courier_mask: int) -> bool:
+    return order_mask & courier_mask != 0
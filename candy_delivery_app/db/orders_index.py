@@ -0,0 +1,79 @@
+import heapq
+from bisect import bisect_right, insort
+from typing import Dict, List, Iterable, NamedTuple, Tuple
+
+from candy_delivery_app.models.settings import settings
+
+
+class FreeOrder(NamedTuple):
+    id: int
+    weight: float
+    region: int
+    delivery_hours_mask: int
+
+
+class OrdersIndex:
+    """
+    Свободные (не назначенные и не завершенные) заказы по районам,
+    внутри района отсортированы по весу.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self._orders: Dict[int, FreeOrder] = {}
+        self._regions: Dict[int, List[Tuple[float, int]]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.orders_index and self.ready
+
+    def rebuild(self, orders: Iterable[FreeOrder]) -> None:
+        self._orders = {}
+        self._regions = {}
+        self._add(orders)
+        self.ready = True
+
+    def add(self, orders: Iterable[FreeOrder]) -> None:
+        if self.enabled:
+            self._add(orders)
+
+    def _add(self, orders: Iterable[FreeOrder]) -> None:
+        for order in orders:
+            if order.id in self._orders:
+                continue
+            self._orders[order.id] = order
+            insort(self._regions.setdefault(order.region, []), (order.weight, order.id))
+
+    def discard(self, orders_ids: Iterable[int]) -> None:
+        if not self.enabled:
+            return
+
+        for order_id in orders_ids:
+            order = self._orders.pop(order_id, None)
+            if order is None:
+                continue
+            region_orders = self._regions[order.region]
+            region_orders.pop(bisect_right(region_orders, (order.weight, order.id)) - 1)
+
+    def get_orders(
+        self, regions: Iterable[int], max_weight: float, hours_mask: int
+    ) -> List[FreeOrder]:
+        regions_orders = []
+        for region in set(regions):
+            region_orders = self._regions.get(region, [])
+            end = bisect_right(region_orders, (max_weight, float("inf")))
+            regions_orders.append(region_orders[:end])
+
+        orders = (
+            self._orders[order_id] for _, order_id in heapq.merge(*regions_orders)
+        )
+        return [order for order in orders if order.delivery_hours_mask & hours_mask]
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._orders
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+
+orders_index = OrdersIndex()
@@ -0,0 +1,66 @@
+import time
+from typing import Any, Dict
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from ..metrics import TimingStats
+from ..models.settings import settings
+
+
+class TimedAsyncAdaptedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который замеряет время получения соединения: ожидание
+    свободного соединения в очереди и открытие нового
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquire_stats = TimingStats()
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.acquire_stats.add(time.monotonic() - started)
+
+    def dict(self) -> Dict[str, Any]:
+        # overflow в QueuePool отсчитывается от -pool_size
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "open": self.size() + self.overflow(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "timeouts": self.timeouts,
+            "acquire": self.acquire_stats.dict(),
+        }
+
+
+def get_engine_options() -> Dict[str, Any]:
+    """
+    Параметры create_async_engine из настроек db_*. За pgbouncer в режиме
+    transaction соединение между транзакциями может смениться, поэтому кэши
+    подготовленных запросов asyncpg и SQLAlchemy отключаются
+    """
+    statement_cache_size = (
+        0 if settings.db_pgbouncer else settings.db_statement_cache_size
+    )
+    return {
+        "poolclass": TimedAsyncAdaptedQueuePool,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "connect_args": {
+            "statement_cache_size": statement_cache_size,
+            "prepared_statement_cache_size": statement_cache_size,
+        },
+    }
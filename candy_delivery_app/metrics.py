@@ -0,0 +1,25 @@
+from typing import Dict
+
+
+class TimingStats:
+    """
+    Количество замеров, суммарное и максимальное время (в секундах)
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total": round(self.total, 6),
+            "avg": round(self.total / self.count, 6) if self.count else 0.0,
+            "max": round(self.max, 6),
+        }
@@ -1,11 +1,13 @@
 from enum import Enum
 from typing import List, Optional, Dict, Union, Tuple
 
-from pydantic import Field, validator, confloat, conint, BaseModel
+from pydantic import Field, validator, confloat, conint, conlist, BaseModel
 from ._types import COURIER_ID, REGIONS, HOURS_LIST
 from .settings import CoreModel
 from .utils import hours_validate
 
+MAX_BATCH_GET_COURIERS = 1000
+
 
 class CourierType(str, Enum):
     FOOT = "foot"  # 10
@@ -41,7 +43,7 @@ class CouriersPostRequestModel(CoreModel):
 
 
 class CouriersIdsAP(BaseModel):
-    couriers: List[CourierId] = Field(..., min_items=1)
+    couriers: List[CourierId]
     errors_data: List[Dict[str, Union[Tuple, str]]]
 
 
@@ -62,6 +64,15 @@ class CourierGetResponseModel(CoreModel):
     )
 
 
+class CouriersGetRequestModel(CoreModel):
+    ids: conlist(conint(ge=0), min_items=1, max_items=MAX_BATCH_GET_COURIERS)
+
+
+class CouriersGetResponseModel(CoreModel):
+    couriers: List[CourierGetResponseModel]
+    not_found: List[conint(ge=0)]
+
+
 class CourierGetResponseModelNoRating(CoreModel):
     courier_id: COURIER_ID
     courier_type: CourierType
@@ -1,13 +1,16 @@
 import datetime
 from typing import List, Union, Optional, Dict, Tuple
 
-from pydantic import Field, conint, confloat, validator, BaseModel
+from pydantic import Field, conint, confloat, conlist, validator, BaseModel
 from dateutil import parser
 
 from ._types import COURIER_ID, ORDER_ID, HOURS_LIST
 from .settings import CoreModel
 from .utils import hours_validate
 
+MAX_BATCH_COURIERS = 1000
+MAX_BATCH_COMPLETE_ORDERS = 1000
+
 
 class OrderItem(CoreModel):
     order_id: ORDER_ID
@@ -33,7 +36,7 @@ class OrdersPostRequestModel(CoreModel):
 
 
 class OrdersIdsAP(BaseModel):
-    orders: List[OrderId] = Field(..., min_items=1)
+    orders: List[OrderId]
     errors_data: List[Dict[str, Union[Tuple, str]]]
 
 
@@ -50,6 +53,24 @@ class OrdersAssignPostResponseModel(CoreModel):
     assign_time: Optional[datetime.datetime]
 
 
+class OrdersAssignBatchPostRequestModel(CoreModel):
+    couriers_ids: conlist(COURIER_ID, min_items=1, max_items=MAX_BATCH_COURIERS)
+
+    @validator("couriers_ids")
+    def check_unique_ids(cls, value):
+        if len(set(value)) != len(value):
+            raise ValueError("couriers_ids duplicates")
+        return value
+
+
+class CourierOrdersAssignResponseModel(OrdersAssignPostResponseModel):
+    courier_id: COURIER_ID
+
+
+class OrdersAssignBatchPostResponseModel(CoreModel):
+    couriers: List[CourierOrdersAssignResponseModel]
+
+
 class OrderCompleteBadRequestModel(CoreModel):
     validation_error: dict
 
@@ -70,3 +91,21 @@ class OrdersCompletePostRequestModel(CoreModel):
 
 class OrdersCompletePostResponseModel(CoreModel):
     order_id: ORDER_ID
+
+
+class OrdersCompleteBatchPostRequestModel(CoreModel):
+    orders: conlist(
+        OrdersCompletePostRequestModel,
+        min_items=1,
+        max_items=MAX_BATCH_COMPLETE_ORDERS,
+    )
+
+
+class OrderCompleteResultModel(CoreModel):
+    order_id: ORDER_ID
+    courier_id: COURIER_ID
+    completed: bool
+
+
+class OrdersCompleteBatchPostResponseModel(CoreModel):
+    orders: List[OrderCompleteResultModel]
@@ -1,6 +1,66 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, BaseSettings
 
 
 class CoreModel(BaseModel):
     class Config:
         extra = "forbid"
+
+
+class AppSettings(BaseSettings):
+    # индекс свободных заказов в памяти процесса. Заказы, созданные другими
+    # воркерами, в него не попадают, поэтому включать только при одном воркере
+    orders_index: bool = False
+
+    # рюкзак для больших наборов кандидатов считается в пуле процессов
+    solver_pool: bool = False
+    solver_pool_size: Optional[int] = None  # None - по числу ядер
+    solver_inline_max_candidates: int = 200
+
+    # выгрузки от bulk_import_min_items элементов заливаются через COPY
+    bulk_import_min_items: int = 1000
+    bulk_import_chunk_size: int = 5000
+
+    # тела от streaming_import_min_size байт (и chunked без длины) разбираются
+    # потоком, без client_max_size и без загрузки всего json в память
+    streaming_import_min_size: int = 1024 * 1024
+    streaming_import_chunk_size: int = 1000
+    # client_max_size к ним не применяется, вместо него предел всего тела
+    # и одного элемента data (символов), который держится в памяти целиком
+    streaming_import_max_size: int = 1024 * 1024 * 1024
+    streaming_import_max_item_size: int = 1024 * 1024
+
+    # выгрузки больше validation_chunk_size элементов валидируются кусками,
+    # между которыми event loop обрабатывает другие запросы
+    validation_chunk_size: int = 1000
+
+    # сколько разных строк промежутков ("09:00-18:00") держать разобранными
+    hours_cache_size: int = 4096
+
+    # кэш ответов GET /couriers/{id}. Изменения из других воркеров видны
+    # с задержкой до couriers_cache_ttl секунд
+    couriers_cache: bool = False
+    couriers_cache_size: int = 10000
+    couriers_cache_ttl: float = 5.0
+
+    # на сколько месяцев вперед создавать секции deliveries при старте
+    deliveries_partitions_ahead: int = 3
+
+    # пул соединений с базой в каждом воркере: до db_pool_size +
+    # db_max_overflow соединений, db_pool_recycle -1 - не пересоздавать
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = -1
+    db_pool_pre_ping: bool = False
+    # кэш подготовленных запросов на соединение (asyncpg и SQLAlchemy)
+    db_statement_cache_size: int = 100
+    # pgbouncer в режиме transaction - кэши подготовленных запросов выключены
+    db_pgbouncer: bool = False
+
+    class Config:
+        env_file = ".env"
+
+
+settings = AppSettings()
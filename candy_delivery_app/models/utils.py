@@ -1,14 +1,20 @@
-import datetime
 import re
-from typing import List, Dict
+from functools import lru_cache
+from typing import List, Dict, Tuple
 
 from candy_delivery_app.models import HOURS_LIST
 from candy_delivery_app.models._types import HOURS_LIST_
+from candy_delivery_app.models.settings import settings
 
 period_re = re.compile(r"^(\d\d):(\d\d)-(\d\d):(\d\d)$")
 
+MINUTES_IN_DAY = 24 * 60
 
-def get_hours_and_minutes_from_str(raw_date: str):
+
+# промежутков в выгрузках немного разных, поэтому разбор каждой строки
+# кэшируется: валидация и подготовка строк для базы разбирают ее один раз
+@lru_cache(maxsize=settings.hours_cache_size)
+def get_hours_and_minutes_from_str(raw_date: str) -> Tuple[int, int, int, int]:
     period = re.findall(period_re, raw_date)
     if not period:
         raise ValueError(f"Invalid date - {raw_date}")
@@ -44,12 +50,52 @@ def get_timedeltas_from_string(value: HOURS_LIST_) -> List[Dict[str, int]]:
             second_minute,
         ) = get_hours_and_minutes_from_str(raw_period)
 
-        first_time = datetime.timedelta(hours=first_hour, minutes=first_minute)
-        second_time = datetime.timedelta(hours=second_hour, minutes=second_minute)
         new_values.append(
             {
-                "first_time": int(first_time.total_seconds()),
-                "second_time": int(second_time.total_seconds()),
+                "first_time": first_hour * 3600 + first_minute * 60,
+                "second_time": second_hour * 3600 + second_minute * 60,
             }
         )
     return new_values
+
+
+def get_hours_cache_stats() -> dict:
+    cache_info = get_hours_and_minutes_from_str.cache_info()
+    return {
+        "hits": cache_info.hits,
+        "misses": cache_info.misses,
+        "size": cache_info.currsize,
+        "max_size": cache_info.maxsize,
+    }
+
+
+def get_minutes_mask_from_timedeltas(value: List[Dict[str, int]]) -> int:
+    """
+    Переводит промежутки в маску минут суток. Пересечение двух списков
+    промежутков - это просто mask_1 & mask_2 != 0
+    """
+    return get_minutes_mask_from_ranges(
+        [(period["first_time"] // 60, period["second_time"] // 60) for period in value]
+    )
+
+
+def get_minutes_ranges_from_mask(mask: int) -> List[Tuple[int, int]]:
+    """
+    Обратное преобразование: непрерывные промежутки [начало, конец) в минутах
+    """
+    ranges = []
+    while mask:
+        start = (mask & -mask).bit_length() - 1
+        shifted = mask >> start
+        length = (~shifted & (shifted + 1)).bit_length() - 1
+        ranges.append((start, start + length))
+        mask &= ~(((1 << length) - 1) << start)
+    return ranges
+
+
+def get_minutes_mask_from_ranges(ranges: List[Tuple[int, int]]) -> int:
+    mask = 0
+    for start, end in ranges:
+        if start < end:
+            mask |= ((1 << (end - start)) - 1) << start
+    return mask
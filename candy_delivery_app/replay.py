@@ -0,0 +1,199 @@
+import asyncio
+import json
+import math
+import re
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from aiohttp import ClientSession, web
+from aiohttp.test_utils import TestClient, TestServer
+
+# числовые сегменты пути (id курьеров) сводятся к одному маршруту
+id_segment_re = re.compile(r"/\d+(?=/|$)")
+
+
+class RecordedRequest(NamedTuple):
+    method: str
+    path: str
+    json: Optional[Any] = None
+
+
+def load_requests(lines: Iterable[str]) -> List[RecordedRequest]:
+    """
+    Одна строка - один запрос: {"method": "POST", "path": "/orders", "json": {...}}
+    """
+    requests = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        data = json.loads(line)
+        if "method" not in data or "path" not in data:
+            raise ValueError(f"line {number}: expected method and path")
+        requests.append(
+            RecordedRequest(
+                method=data["method"].upper(), path=data["path"], json=data.get("json")
+            )
+        )
+    return requests
+
+
+def get_route(request: RecordedRequest) -> str:
+    return f"{request.method} {id_segment_re.sub('/{id}', request.path)}"
+
+
+def percentile(sorted_values: List[float], percent: float) -> float:
+    # ближайший ранг, значения уже отсортированы
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+
+    def add(self, latency: float, status: Optional[int]) -> None:
+        self.latencies.append(latency)
+        if status is None or status >= 500:
+            self.errors += 1
+        if status is not None:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def dict(self) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        return {
+            "count": len(latencies),
+            "errors": self.errors,
+            "statuses": dict(sorted(self.statuses.items())),
+            "p50": round(percentile(latencies, 50), 6),
+            "p95": round(percentile(latencies, 95), 6),
+            "p99": round(percentile(latencies, 99), 6),
+            "max": round(latencies[-1], 6) if latencies else 0.0,
+        }
+
+
+class ReplayStats:
+    def __init__(self):
+        self.routes: Dict[str, RouteStats] = {}
+        self.elapsed = 0.0
+
+    def add(self, route: str, latency: float, status: Optional[int]) -> None:
+        self.routes.setdefault(route, RouteStats()).add(latency, status)
+
+    def dict(self) -> Dict[str, Any]:
+        count = sum(len(route.latencies) for route in self.routes.values())
+        return {
+            "requests": count,
+            "errors": sum(route.errors for route in self.routes.values()),
+            "elapsed": round(self.elapsed, 6),
+            "throughput": round(count / self.elapsed, 2) if self.elapsed else 0.0,
+            "routes": {
+                route: stats.dict() for route, stats in sorted(self.routes.items())
+            },
+        }
+
+
+async def replay(
+    client: Any,
+    requests: List[RecordedRequest],
+    rate: Optional[float] = None,
+    concurrency: int = 1,
+) -> ReplayStats:
+    """
+    Отправляет запросы в порядке записи: не больше concurrency одновременно и,
+    если задан rate, не чаще rate запросов в секунду. client - UrlClient
+    или TestClient, у обоих request(method, path, json=...).
+    С concurrency=1 запросы идут строго по очереди, как в записи
+    """
+    stats = ReplayStats()
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def send(request: RecordedRequest) -> None:
+        status = None
+        started = loop.time()
+        try:
+            async with client.request(
+                request.method, request.path, json=request.json
+            ) as response:
+                await response.read()
+                status = response.status
+        except Exception:
+            pass
+        finally:
+            stats.add(get_route(request), loop.time() - started, status)
+            semaphore.release()
+
+    tasks = []
+    started = loop.time()
+    for i, request in enumerate(requests):
+        if rate:
+            delay = started + i / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await semaphore.acquire()
+        tasks.append(asyncio.ensure_future(send(request)))
+
+    await asyncio.gather(*tasks)
+    stats.elapsed = loop.time() - started
+    return stats
+
+
+async def replay_app(
+    app: web.Application,
+    requests: List[RecordedRequest],
+    rate: Optional[float] = None,
+    concurrency: int = 1,
+) -> ReplayStats:
+    # приложение в этом же процессе, через тестовый сервер aiohttp
+    client = TestClient(TestServer(app))
+    await client.start_server()
+    try:
+        return await replay(client, requests, rate=rate, concurrency=concurrency)
+    finally:
+        await client.close()
+
+
+class UrlClient:
+    """
+    Запросы к серверу по адресу url. base_url у ClientSession есть только
+    с aiohttp 3.8, а в poetry.lock 3.7
+    """
+
+    def __init__(self, session: ClientSession, url: str):
+        self.session = session
+        self.url = url.rstrip("/")
+
+    def request(self, method: str, path: str, **kwargs: Any):
+        return self.session.request(method, self.url + path, **kwargs)
+
+
+async def replay_url(
+    url: str,
+    requests: List[RecordedRequest],
+    rate: Optional[float] = None,
+    concurrency: int = 1,
+) -> ReplayStats:
+    async with ClientSession() as session:
+        client = UrlClient(session, url)
+        return await replay(client, requests, rate=rate, concurrency=concurrency)
+
+
+def format_stats(stats: ReplayStats) -> str:
+    data = stats.dict()
+    lines = [
+        f"requests: {data['requests']}, errors: {data['errors']}, "
+        f"elapsed: {data['elapsed']:.3f}s, throughput: {data['throughput']} rps",
+        f"{'route':<32}{'count':>8}{'errors':>8}"
+        f"{'p50, ms':>10}{'p95, ms':>10}{'p99, ms':>10}",
+    ]
+    for route, route_data in data["routes"].items():
+        lines.append(
+            f"{route:<32}{route_data['count']:>8}{route_data['errors']:>8}"
+            + "".join(
+                f"{route_data[key] * 1000:>10.1f}" for key in ("p50", "p95", "p99")
+            )
+        )
+    return "\n".join(lines)
@@ -0,0 +1,11 @@
+import asyncio
+
+from candy_delivery_app.db.migrations import migrate
+
+
+async def main():
+    for migration in await migrate():
+        print(f"applied {migration.version}: {migration.description}")
+
+
+asyncio.get_event_loop().run_until_complete(main())
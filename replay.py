@@ -0,0 +1,49 @@
+import argparse
+import asyncio
+import json
+
+from candy_delivery_app.replay import (
+    load_requests,
+    replay_app,
+    replay_url,
+    format_stats,
+)
+
+
+def get_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Проигрывает записанные запросы и считает задержки по маршрутам"
+    )
+    parser.add_argument(
+        "path", help='jsonl, строка - {"method": ..., "path": ..., "json": ...}'
+    )
+    parser.add_argument(
+        "--url", help="адрес запущенного сервиса, по умолчанию app в этом процессе"
+    )
+    parser.add_argument("--rate", type=float, help="запросов в секунду")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="вывести статистику json")
+    return parser.parse_args()
+
+
+async def main():
+    args = get_args()
+    with open(args.path) as file:
+        requests = load_requests(file) * args.repeat
+
+    if args.url:
+        stats = await replay_url(
+            args.url, requests, rate=args.rate, concurrency=args.concurrency
+        )
+    else:
+        from app import app
+
+        stats = await replay_app(
+            app, requests, rate=args.rate, concurrency=args.concurrency
+        )
+
+    print(json.dumps(stats.dict(), indent=2) if args.json else format_stats(stats))
+
+
+asyncio.get_event_loop().run_until_complete(main())
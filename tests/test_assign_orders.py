@@ -327,3 +327,50 @@ async def test_weight_patch_order(cli, session_):
 
     assert len(courier.orders) == 1
     assert courier.orders[0].weight == 10
+
+
+async def test_assign_skips_orders_out_of_working_hours(cli, session_):
+    await update_base()
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "car",
+                    "regions": [22],
+                    "working_hours": ["09:00-11:00"],
+                },
+            ]
+        },
+        session=session_,
+    )
+
+    await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 1,
+                    "weight": 40,
+                    "region": 22,
+                    "delivery_hours": ["20:00-21:00"],
+                },
+                {
+                    "order_id": 2,
+                    "weight": 26,
+                    "region": 22,
+                    "delivery_hours": ["10:00-11:00"],
+                },
+                {
+                    "order_id": 3,
+                    "weight": 20,
+                    "region": 22,
+                    "delivery_hours": ["08:00-09:30"],
+                },
+            ]
+        },
+    )
+
+    r = await cli.post("/orders/assign", json={"courier_id": 1})
+    json_data = await r.json()
+    assert sorted(order["id"] for order in json_data["orders"]) == [2, 3]
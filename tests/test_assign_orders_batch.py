@@ -0,0 +1,163 @@
+import asyncio
+import os
+
+import dotenv
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.orders import Order
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+async def test_couriers_assign_batch(cli, session_):
+    await update_base()
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "foot",
+                    "regions": [1, 2],
+                    "working_hours": ["09:00-18:00"],
+                },
+                {
+                    "courier_id": 2,
+                    "courier_type": "car",
+                    "regions": [1, 2],
+                    "working_hours": ["09:00-18:00"],
+                },
+                {
+                    "courier_id": 3,
+                    "courier_type": "bike",
+                    "regions": [],
+                    "working_hours": ["09:00-18:00"],
+                },
+                {
+                    "courier_id": 4,
+                    "courier_type": "bike",
+                    "regions": [3],
+                    "working_hours": ["09:00-18:00"],
+                },
+            ]
+        },
+        session=session_,
+    )
+
+    await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 1,
+                    "weight": 8,
+                    "region": 1,
+                    "delivery_hours": ["09:00-18:00"],
+                },
+                {
+                    "order_id": 2,
+                    "weight": 2,
+                    "region": 2,
+                    "delivery_hours": ["09:00-18:00"],
+                },
+                {
+                    "order_id": 3,
+                    "weight": 30,
+                    "region": 2,
+                    "delivery_hours": ["09:00-18:00"],
+                },
+                {
+                    "order_id": 4,
+                    "weight": 15,
+                    "region": 1,
+                    "delivery_hours": ["09:00-18:00"],
+                },
+            ]
+        },
+    )
+
+    r = await cli.post("/orders/assign/batch", json={"couriers_ids": [2, 1, 3]})
+    assert r.status == 200
+    json_data = await r.json()
+
+    assert [courier["courier_id"] for courier in json_data["couriers"]] == [2, 1, 3]
+    car, foot, empty = json_data["couriers"]
+
+    assert sorted(order["id"] for order in foot["orders"]) == [1, 2]
+    assert sorted(order["id"] for order in car["orders"]) == [3, 4]
+    assert foot["assign_time"] == car["assign_time"]
+    assert empty["orders"] == []
+    assert empty.get("assign_time") is None
+
+    orders = (await session_.execute(select(Order).order_by(Order.id))).fetchall()
+    assert [order.courier_id for (order,) in orders] == [1, 1, 2, 2]
+
+    r = await cli.post("/orders/assign/batch", json={"couriers_ids": [1, 4]})
+    json_data = await r.json()
+    foot, bike = json_data["couriers"]
+    assert sorted(order["id"] for order in foot["orders"]) == [1, 2]
+    assert bike["orders"] == []
+
+    r = await cli.post("/orders/assign", json={"courier_id": 2})
+    json_data = await r.json()
+    assert sorted(order["id"] for order in json_data["orders"]) == [3, 4]
+
+
+async def test_couriers_assign_batch_bad_request(cli, session_):
+    await update_base()
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "foot",
+                    "regions": [1],
+                    "working_hours": ["09:00-18:00"],
+                },
+            ]
+        },
+        session=session_,
+    )
+
+    r = await cli.post("/orders/assign/batch", json={"couriers_ids": [1, 1337]})
+    assert r.status == 400
+
+    r = await cli.post("/orders/assign/batch", json={"couriers_ids": [1, 1]})
+    assert r.status == 400
+
+    r = await cli.post("/orders/assign/batch", json={"couriers_ids": []})
+    assert r.status == 400
+
+    r = await cli.post("/orders/assign/batch", json={"courier_id": 1})
+    assert r.status == 400
@@ -0,0 +1,33 @@
+from collections import namedtuple
+
+from candy_delivery_app.business_models.orders.utils import (
+    get_best_orders,
+    MAX_BEST_ORDERS_CANDIDATES,
+)
+
+RawOrder = namedtuple("RawOrder", ["id", "weight"])
+
+
+def test_best_orders():
+    orders = [RawOrder(1, 5), RawOrder(2, 6), RawOrder(3, 10)]
+    assert [order.id for order in get_best_orders(orders, capacity=50)] == [3, 2, 1]
+    assert [order.id for order in get_best_orders(orders, capacity=10)] == [3]
+
+    orders = [RawOrder(1, 26), RawOrder(2, 26), RawOrder(3, 40)]
+    assert [order.id for order in get_best_orders(orders, capacity=50)] == [3]
+
+    assert get_best_orders([], capacity=10) == []
+    assert get_best_orders([RawOrder(1, 11)], capacity=10) == []
+
+
+def test_best_orders_float_weights():
+    orders = [RawOrder(1, 0.01), RawOrder(2, 0.1), RawOrder(3, 0.2), RawOrder(4, 9.7)]
+    best = get_best_orders(orders, capacity=10)
+    assert sorted(order.id for order in best) == [2, 3, 4]
+
+
+def test_best_orders_many_candidates():
+    orders = [RawOrder(i, 0.01) for i in range(1, 10001)]
+    best = get_best_orders(orders, capacity=50)
+    assert len(best) == MAX_BEST_ORDERS_CANDIDATES
+    assert {order.id for order in best} == set(range(1, MAX_BEST_ORDERS_CANDIDATES + 1))
@@ -0,0 +1,171 @@
+import asyncio
+import os
+
+import dotenv
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.couriers import Courier, CourierType
+from candy_delivery_app.db.models.orders import Order
+from candy_delivery_app.models.settings import settings
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+@pytest.fixture
+def bulk_import():
+    min_items, chunk_size = (
+        settings.bulk_import_min_items,
+        settings.bulk_import_chunk_size,
+    )
+    settings.bulk_import_min_items, settings.bulk_import_chunk_size = 1, 2
+    yield
+    settings.bulk_import_min_items, settings.bulk_import_chunk_size = (
+        min_items,
+        chunk_size,
+    )
+
+
+async def test_bulk_import(cli, session_, bulk_import):
+    await update_base()
+
+    response = await cli.post(
+        "/couriers",
+        json={
+            "data": [
+                {
+                    "courier_id": i,
+                    "courier_type": "bike",
+                    "regions": [1, i],
+                    "working_hours": ["09:00-11:00", "12:00-12:30"],
+                }
+                for i in range(1, 6)
+            ]
+        },
+    )
+    assert response.status == 201
+    assert await response.json() == {"couriers": [{"id": i} for i in range(1, 6)]}
+
+    response = await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": i,
+                    "weight": 0.5 * i,
+                    "region": 1,
+                    "delivery_hours": ["10:00-12:15"],
+                }
+                for i in range(1, 6)
+            ]
+        },
+    )
+    assert response.status == 201
+    assert await response.json() == {"orders": [{"id": i} for i in range(1, 6)]}
+
+    couriers = (
+        (await session_.execute(select(Courier).order_by(Courier.id))).scalars().all()
+    )
+    assert [courier.id for courier in couriers] == [1, 2, 3, 4, 5]
+    courier = couriers[2]
+    assert courier.courier_type == CourierType.BIKE
+    assert courier.regions == [1, 3]
+    assert courier.working_hours == ["09:00-11:00", "12:00-12:30"]
+    assert courier.working_hours_mask == (
+        ((1 << 120) - 1) << 540 | ((1 << 30) - 1) << 720
+    )
+    assert len(courier.working_hours_timedeltas) == 2
+    assert courier.earnings == 0
+
+    orders = (await session_.execute(select(Order).order_by(Order.id))).scalars().all()
+    assert [order.weight for order in orders] == [0.5, 1, 1.5, 2, 2.5]
+    assert all(order.completed is False for order in orders)
+    assert orders[0].delivery_hours_mask == ((1 << 135) - 1) << 600
+
+    response = await cli.post("/orders/assign", json={"courier_id": 1})
+    assert response.status == 200
+    assert len((await response.json())["orders"]) == 5
+
+
+async def test_bulk_import_duplicates(cli, session_, bulk_import):
+    await update_base()
+
+    response = await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 1,
+                    "weight": 1,
+                    "region": 1,
+                    "delivery_hours": ["10:00-12:00"],
+                }
+            ]
+        },
+    )
+    assert response.status == 201
+
+    response = await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": order_id,
+                    "weight": 1,
+                    "region": 1,
+                    "delivery_hours": ["10:00-12:00"],
+                }
+                for order_id in [2, 1, 3, 4, 3]
+            ]
+        },
+    )
+    json_response = await response.json()
+    assert response.status == 400
+    assert sorted(
+        json_response["validation_error"]["orders"], key=lambda x: x["id"]
+    ) == [
+        {"id": 1},
+        {"id": 3},
+    ]
+    assert sorted(
+        error["location"][1]
+        for error in json_response["validation_error"]["errors_data"]
+    ) == [1, 2, 4]
+    assert all(
+        error["msg"] == "id duplicates"
+        for error in json_response["validation_error"]["errors_data"]
+    )
+
+    # все или ничего
+    orders = (await session_.execute(select(Order.id))).scalars().all()
+    assert orders == [1]
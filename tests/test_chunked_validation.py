@@ -0,0 +1,86 @@
+import asyncio
+import os
+
+import dotenv
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base
+from candy_delivery_app.models.settings import settings
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+def validation_chunk_size():
+    chunk_size = settings.validation_chunk_size
+    yield
+    settings.validation_chunk_size = chunk_size
+
+
+def get_couriers(couriers_ids):
+    return [
+        {
+            "courier_id": courier_id,
+            "courier_type": "foot",
+            "regions": [1, 2],
+            "working_hours": ["09:00-18:00"],
+        }
+        for courier_id in couriers_ids
+    ]
+
+
+async def test_chunked_validation(cli, validation_chunk_size):
+    await update_base()
+
+    data = get_couriers(range(1, 10))
+    data[0]["courier_type"] = "plane"
+    data[3]["regions"] = [1, -2]
+    data[3]["working_hours"] = ["9-18"]
+    data[8]["extra"] = 1
+
+    responses = []
+    for chunk_size in [100, 2, 3]:
+        settings.validation_chunk_size = chunk_size
+        response = await cli.post("/couriers", json={"data": data})
+        assert response.status == 400
+        responses.append(await response.json())
+
+    assert responses[0] == responses[1] == responses[2]
+    assert responses[0]["validation_error"]["couriers"] == [
+        {"id": 1},
+        {"id": 4},
+        {"id": 9},
+    ]
+    assert [
+        error["location"] for error in responses[0]["validation_error"]["errors_data"]
+    ] == [
+        ["data", 0, "courier_type"],
+        ["data", 3, "regions", 1],
+        ["data", 3, "working_hours"],
+        ["data", 8, "extra"],
+    ]
+
+    settings.validation_chunk_size = 2
+    response = await cli.post("/couriers", json={"data": get_couriers(range(1, 10))})
+    assert response.status == 201
+    assert await response.json() == {"couriers": [{"id": i} for i in range(1, 10)]}
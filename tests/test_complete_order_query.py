@@ -0,0 +1,149 @@
+import asyncio
+import datetime
+import os
+
+import dotenv
+from sqlalchemy import event
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session, engine
+from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.deliveries import CourierRegionStats, Delivery
+from candy_delivery_app.db.models.orders import Order
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+@pytest.fixture
+def statements():
+    executed = []
+
+    def before_cursor_execute(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    yield executed
+    event.remove(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+
+async def test_complete_order_query(loop, session_, statements):
+    await update_base()
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "car",
+                    "regions": [1, 2],
+                    "working_hours": ["00:00-23:59"],
+                }
+            ]
+        },
+        session=session_,
+    )
+    await Order.create_orders(
+        json_data={
+            "data": [
+                {
+                    "order_id": order_id,
+                    "weight": 1,
+                    "region": 1 + order_id % 2,
+                    "delivery_hours": ["00:00-23:59"],
+                }
+                for order_id in range(1, 21)
+            ]
+        },
+        session=session_,
+    )
+    assign_time, orders_ids = await Order.get_orders_for_courier(
+        session=session_, courier_id=1
+    )
+    assert len(orders_ids) == 20
+
+    start = datetime.datetime.fromisoformat(assign_time.rstrip("Z")).replace(
+        tzinfo=datetime.timezone.utc
+    )
+    times = {}
+    last_time = start.timestamp()
+    for minute, order_id in enumerate(orders_ids, start=1):
+        complete_time = start + datetime.timedelta(minutes=minute, microseconds=7)
+        statements.clear()
+        await Courier.lock(session=session_, courier_id=1)
+        assert await Order.complete_order(
+            session=session_,
+            order_id=order_id,
+            courier_id=1,
+            complete_time=complete_time,
+        )
+        # блокировка и один запрос завершения, сколько бы заказов ни было в развозе
+        assert len(statements) == 2
+
+        times.setdefault(1 + order_id % 2, []).append(
+            complete_time.timestamp() - last_time
+        )
+        last_time = complete_time.timestamp()
+
+    courier = await Courier.get_courier(session=session_, courier_id=1)
+    await session_.refresh(courier)
+    deliveries = (
+        await session_.execute(
+            select(Delivery.region, Delivery.duration, Delivery.bag_id)
+            .where(Delivery.courier_id == 1)
+            .order_by(Delivery.completed_at)
+        )
+    ).fetchall()
+    assert {bag_id for _, _, bag_id in deliveries} == {1}
+    for region, region_times in times.items():
+        assert [
+            duration for region_, duration, _ in deliveries if region_ == region
+        ] == region_times
+    stats = (
+        await session_.execute(
+            select(CourierRegionStats).where(CourierRegionStats.courier_id == 1)
+        )
+    ).scalars()
+    assert {s.region: (s.deliveries, pytest.approx(s.total_time)) for s in stats} == {
+        region: (10, sum(region_times)) for region, region_times in times.items()
+    }
+    assert courier.bag_id == 2
+    assert courier.earnings == 20 * 500 * 9
+    assert courier.version == 22
+
+    t = min(sum(values) / len(values) for values in times.values())
+    assert courier.rating == round((60 * 60 - min(t, 60 * 60)) / (60 * 60) * 5, 2)
+
+    # повторно - тем же курьером и с тем же временем
+    assert await Order.complete_order(
+        session=session_,
+        order_id=orders_ids[-1],
+        courier_id=1,
+        complete_time=complete_time,
+    )
+    assert not await Order.complete_order(
+        session=session_,
+        order_id=orders_ids[-1],
+        courier_id=1,
+        complete_time=complete_time + datetime.timedelta(seconds=1),
+    )
+    assert not await Order.complete_order(
+        session=session_, order_id=100, courier_id=1, complete_time=complete_time
+    )
@@ -0,0 +1,188 @@
+import asyncio
+import os
+
+import dotenv
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.orders import Order
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+async def test_concurrent_assign(cli, session_):
+    await update_base()
+    couriers_count = 30
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": courier_id,
+                    "courier_type": "foot",
+                    "regions": [1, 2],
+                    "working_hours": ["09:00-18:00"],
+                }
+                for courier_id in range(1, couriers_count + 1)
+            ]
+        },
+        session=session_,
+    )
+    await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": order_id,
+                    "weight": 1 + order_id % 4,
+                    "region": 1 + order_id % 2,
+                    "delivery_hours": ["10:00-12:00"],
+                }
+                for order_id in range(1, 101)
+            ]
+        },
+    )
+
+    async def assign(courier_id):
+        response = await cli.post("/orders/assign", json={"courier_id": courier_id})
+        assert response.status == 200
+        json_data = await response.json()
+        return courier_id, sorted(order["id"] for order in json_data["orders"])
+
+    # каждый курьер запрашивает заказы несколько раз одновременно с остальными
+    results = await asyncio.gather(
+        *[
+            assign(courier_id)
+            for _ in range(3)
+            for courier_id in range(1, couriers_count + 1)
+        ]
+    )
+
+    db_orders = (
+        await session_.execute(select(Order).where(Order.courier_id.isnot(None)))
+    ).fetchall()
+    db_couriers_orders = {}
+    for (order,) in db_orders:
+        db_couriers_orders.setdefault(order.courier_id, []).append(order.id)
+
+    # ответ либо пустой (свободных заказов в тот момент не было), либо
+    # совпадает с тем, что реально записано за курьером
+    couriers_responses = {}
+    for courier_id, orders_ids in results:
+        if orders_ids:
+            assert orders_ids == sorted(db_couriers_orders[courier_id])
+            couriers_responses[courier_id] = orders_ids
+
+    assigned = [
+        order_id
+        for orders_ids in couriers_responses.values()
+        for order_id in orders_ids
+    ]
+    assert len(assigned) == len(set(assigned)) == len(db_orders)
+
+    for orders_ids in db_couriers_orders.values():
+        assert sum(1 + order_id % 4 for order_id in orders_ids) <= 10
+
+
+async def test_assign_locks_only_assigned_orders(cli, session_):
+    await update_base()
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "bike",
+                    "regions": [1],
+                    "working_hours": ["09:00-18:00"],
+                }
+            ]
+        },
+        session=session_,
+    )
+    await Order.create_orders(
+        json_data={
+            "data": [
+                {
+                    "order_id": order_id,
+                    "weight": weight,
+                    "region": 1,
+                    "delivery_hours": ["09:00-18:00"],
+                }
+                for order_id, weight in enumerate([10, 5, 4, 4, 4], start=1)
+            ]
+        },
+        session=session_,
+    )
+
+    # лучший набор 10 + 5, но заказ 1 держит другая транзакция
+    other_session = session()
+    assign_session = session()
+    check_session = session()
+    try:
+        await other_session.execute(
+            select(Order.id).where(Order.id == 1).with_for_update()
+        )
+
+        courier = await Courier.get_courier(session=assign_session, courier_id=1)
+        orders = await Order.get_available_orders(
+            session=assign_session,
+            regions=courier.regions,
+            max_weight=courier.get_capacity(),
+            hours_mask=courier.working_hours_mask,
+        )
+        good_orders = await Order.assign_best_orders(
+            session=assign_session,
+            courier=courier,
+            orders=orders,
+            assign_time=Order.get_assign_time(),
+        )
+        assert sorted(order.weight for order in good_orders) == [4, 4, 5]
+
+        # неиспользованный кандидат не заблокирован до конца транзакции
+        free_ids = (
+            (
+                await check_session.execute(
+                    select(Order.id)
+                    .where(Order.id.in_([1, 2, 3, 4, 5]))
+                    .with_for_update(skip_locked=True)
+                )
+            )
+            .scalars()
+            .all()
+        )
+        assert len(free_ids) == 1
+        assert free_ids[0] not in {order.id for order in good_orders}
+    finally:
+        for async_session in (check_session, assign_session, other_session):
+            await async_session.rollback()
+            await async_session.close()
@@ -0,0 +1,83 @@
+import asyncio
+import os
+
+import dotenv
+from sqlalchemy import inspect
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.couriers import Courier, CourierLoading
+from candy_delivery_app.db.models.orders import Order
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+async def test_courier_loading(loop):
+    await update_base()
+
+    async with session() as session_:
+        await Courier.create_couriers(
+            session=session_,
+            json_data={
+                "data": [
+                    {
+                        "courier_id": courier_id,
+                        "courier_type": "car",
+                        "regions": [1],
+                        "working_hours": ["09:00-18:00"],
+                    }
+                    for courier_id in (1, 2)
+                ]
+            },
+        )
+        await Order.create_orders(
+            session=session_,
+            json_data={
+                "data": [
+                    {
+                        "order_id": order_id,
+                        "weight": 1,
+                        "region": 1,
+                        "delivery_hours": ["10:00-11:00"],
+                    }
+                    for order_id in (3, 1, 2)
+                ]
+            },
+        )
+        assign_time, orders_ids = await Order.get_orders_for_courier(
+            session=session_, courier_id=1
+        )
+        assert sorted(orders_ids) == [1, 2, 3]
+
+    async with session() as session_:
+        courier = await Courier.get_courier(
+            session=session_, courier_id=1, loading=CourierLoading.SCALARS
+        )
+        assert courier.regions == [1]
+        assert "orders" in inspect(courier).unloaded
+
+    async with session() as session_:
+        couriers = await Courier.get_couriers(
+            session=session_, couriers_ids=[1, 2], loading=CourierLoading.ACTIVE_ORDERS
+        )
+        couriers = {courier.id: courier for courier in couriers}
+        assert couriers[1].active_orders_ids == [1, 2, 3]
+        assert couriers[1].active_assign_time == assign_time
+        assert couriers[2].active_orders_ids == []
+        assert couriers[2].active_assign_time is None
+        assert "orders" in inspect(couriers[1]).unloaded
+
+    async with session() as session_:
+        courier = await Courier.get_courier(session=session_, courier_id=1)
+        assert sorted(order.id for order in courier.orders) == [1, 2, 3]
+
+        assert await Courier.get_courier(session=session_, courier_id=3) is None
@@ -0,0 +1,135 @@
+import asyncio
+import os
+
+import dotenv
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.couriers_cache import couriers_cache
+from candy_delivery_app.db.db import update_base
+from candy_delivery_app.models.settings import settings
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router, stats_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    app.add_routes(stats_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+def cache_enabled():
+    enabled, size, ttl = (
+        settings.couriers_cache,
+        settings.couriers_cache_size,
+        settings.couriers_cache_ttl,
+    )
+    settings.couriers_cache = True
+    couriers_cache.clear()
+    yield
+    settings.couriers_cache = enabled
+    settings.couriers_cache_size = size
+    settings.couriers_cache_ttl = ttl
+    couriers_cache.clear()
+
+
+def test_couriers_cache_lru_and_ttl(cache_enabled):
+    settings.couriers_cache_size = 2
+
+    for courier_id in (1, 2):
+        couriers_cache.set(courier_id, {"id": courier_id}, couriers_cache.generation)
+    assert couriers_cache.get(1) == {"id": 1}
+    couriers_cache.set(3, {"id": 3}, couriers_cache.generation)
+    assert couriers_cache.get(2) is None
+    assert couriers_cache.get(1) == {"id": 1}
+    assert len(couriers_cache) == 2
+
+    # ответ, прочитанный до сброса, не кэшируется
+    generation = couriers_cache.generation
+    couriers_cache.invalidate([1])
+    couriers_cache.set(1, {"id": 1, "stale": True}, generation)
+    assert couriers_cache.get(1) is None
+
+    settings.couriers_cache_ttl = -1
+    couriers_cache.set(1, {"id": 1}, couriers_cache.generation)
+    assert couriers_cache.get(1) is None
+
+
+async def test_couriers_cache(cli, cache_enabled):
+    await update_base()
+
+    await cli.post(
+        "/couriers",
+        json={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "foot",
+                    "regions": [1],
+                    "working_hours": ["09:00-18:00"],
+                }
+            ]
+        },
+    )
+    await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 1,
+                    "weight": 1,
+                    "region": 1,
+                    "delivery_hours": ["10:00-11:00"],
+                }
+            ]
+        },
+    )
+
+    hits, invalidations = couriers_cache.hits, couriers_cache.invalidations
+    for _ in range(3):
+        response = await cli.get("/couriers/1")
+        assert (await response.json())["regions"] == [1]
+    assert couriers_cache.hits == hits + 2
+
+    await cli.patch("/couriers/1", json={"regions": [1, 2]})
+    response = await cli.get("/couriers/1")
+    assert (await response.json())["regions"] == [1, 2]
+
+    await cli.post("/orders/assign", json={"courier_id": 1})
+    await cli.get("/couriers/1")
+    await cli.post(
+        "/orders/complete",
+        json={
+            "courier_id": 1,
+            "order_id": 1,
+            "complete_time": "2099-01-01T10:00:00.000Z",
+        },
+    )
+    response = await cli.get("/couriers/1")
+    json_response = await response.json()
+    assert json_response["earnings"] == 1000
+    assert "rating" in json_response
+
+    response = await cli.get("/couriers/2")
+    assert response.status == 404
+    assert 2 not in couriers_cache._profiles
+
+    stats = (await (await cli.get("/stats")).json())["couriers_cache"]
+    assert stats["enabled"] is True
+    assert stats["hits"] == couriers_cache.hits
+    assert stats["invalidations"] == invalidations + 3
@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import os
+
+import dotenv
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.couriers import Courier
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+async def get_etag(cli, courier_id: int) -> str:
+    resp = await cli.get(f"/couriers/{courier_id}")
+    assert resp.status == 200
+    return resp.headers["ETag"]
+
+
+async def test_couriers_etag(cli, session_):
+    await update_base()
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "foot",
+                    "regions": [1],
+                    "working_hours": ["09:00-18:00"],
+                },
+            ]
+        },
+        session=session_,
+    )
+
+    etag = await get_etag(cli, 1)
+    assert etag == '"1"'
+
+    resp = await cli.get("/couriers/1", headers={"If-None-Match": etag})
+    assert resp.status == 304
+    assert resp.headers["ETag"] == etag
+    assert await resp.read() == b""
+
+    resp = await cli.get("/couriers/1", headers={"If-None-Match": f'"0", W/{etag}'})
+    assert resp.status == 304
+
+    resp = await cli.get("/couriers/1", headers={"If-None-Match": '"0"'})
+    assert resp.status == 200
+    assert resp.headers["ETag"] == etag
+    assert (await resp.json())["courier_id"] == 1
+
+    resp = await cli.get("/couriers/2", headers={"If-None-Match": etag})
+    assert resp.status == 404
+
+    # изменение без изменений версию не трогает
+    resp = await cli.patch("/couriers/1", json={"regions": [1]})
+    assert resp.status == 200
+    assert await get_etag(cli, 1) == etag
+
+    resp = await cli.patch("/couriers/1", json={"regions": [1, 2]})
+    assert resp.status == 200
+    etag = await get_etag(cli, 1)
+    assert etag == '"2"'
+
+    resp = await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 1,
+                    "weight": 1,
+                    "region": 2,
+                    "delivery_hours": ["09:00-18:00"],
+                }
+            ]
+        },
+    )
+    assert resp.status == 201
+
+    resp = await cli.post("/orders/assign", json={"courier_id": 1})
+    assert (await resp.json())["orders"] == [{"id": 1}]
+    etag = await get_etag(cli, 1)
+    assert etag == '"3"'
+
+    # пустое назначение версию не трогает
+    await cli.post("/orders/assign", json={"courier_id": 1})
+    assert await get_etag(cli, 1) == etag
+
+    resp = await cli.post(
+        "/orders/complete",
+        json={
+            "courier_id": 1,
+            "order_id": 1,
+            "complete_time": datetime.datetime.now().isoformat(),
+        },
+    )
+    assert resp.status == 200
+    resp = await cli.get("/couriers/1", headers={"If-None-Match": etag})
+    assert resp.status == 200
+    assert resp.headers["ETag"] == '"4"'
+    assert "rating" in await resp.json()
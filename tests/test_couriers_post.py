@@ -77,7 +77,7 @@ async def test_couriers_post_good(cli, session_):
     assert couriers[0].earnings == 0
     assert couriers[0].rating is None
     assert couriers[0].last_delivery_time is None
-    assert couriers[0].delivery_data is None
+    assert couriers[0].bag_id == 1
 
     assert couriers[1].id == 2
     assert couriers[1].regions == [9]
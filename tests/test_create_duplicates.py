@@ -0,0 +1,74 @@
+import asyncio
+import os
+
+import dotenv
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.orders import Order
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+def get_orders_data(orders_ids):
+    return {
+        "data": [
+            {
+                "order_id": order_id,
+                "weight": 1,
+                "region": 1,
+                "delivery_hours": ["10:00-12:00"],
+            }
+            for order_id in orders_ids
+        ]
+    }
+
+
+async def test_create_duplicates(loop):
+    await update_base()
+
+    async with session() as session_:
+        assert await Order.create_orders(
+            session=session_, json_data=get_orders_data([1, 2])
+        ) == ([1, 2], None)
+
+    async with session() as session_:
+        orders, errors_ids = await Order.create_orders(
+            session=session_, json_data=get_orders_data([3, 2, 4, 4, 5])
+        )
+        assert orders is None
+        assert errors_ids == [2, 4]
+
+    async with session() as session_:
+        orders_ids = (await session_.execute(select(Order.id))).scalars().all()
+        assert sorted(orders_ids) == [1, 2]
+
+
+async def test_create_concurrent_duplicates(loop):
+    await update_base()
+
+    async def create(orders_ids):
+        async with session() as session_:
+            return await Order.create_orders(
+                session=session_, json_data=get_orders_data(orders_ids)
+            )
+
+    results = await asyncio.gather(
+        *(create([1, 2, 3]) for _ in range(5)), create([3, 4])
+    )
+    created = [orders for orders, _ in results if orders is not None]
+    assert len(created) == 1
+
+    async with session() as session_:
+        orders_ids = (await session_.execute(select(Order.id))).scalars().all()
+        assert sorted(orders_ids) == sorted(created[0])
@@ -0,0 +1,95 @@
+import asyncio
+import os
+
+import dotenv
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.pool import get_engine_options
+from candy_delivery_app.models.settings import settings
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, stats_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(stats_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+def db_settings():
+    fields = (
+        "db_pool_size",
+        "db_max_overflow",
+        "db_pool_timeout",
+        "db_pgbouncer",
+        "db_statement_cache_size",
+    )
+    saved = {field: getattr(settings, field) for field in fields}
+    yield
+    for field, value in saved.items():
+        setattr(settings, field, value)
+
+
+def test_engine_options(db_settings):
+    settings.db_pgbouncer = False
+    settings.db_statement_cache_size = 500
+    options = get_engine_options()
+    assert options["connect_args"] == {
+        "statement_cache_size": 500,
+        "prepared_statement_cache_size": 500,
+    }
+
+    settings.db_pgbouncer = True
+    assert get_engine_options()["connect_args"] == {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+    }
+
+
+async def test_pool_stats(loop, db_settings):
+    settings.db_pool_size = 1
+    settings.db_max_overflow = 0
+    settings.db_pool_timeout = 0.05
+    engine = create_async_engine(DB_URI.get(), **get_engine_options())
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.exec_driver_sql("SELECT 1")).scalar() == 1
+            stats = engine.pool.dict()
+            assert (stats["checked_out"], stats["idle"], stats["open"]) == (1, 0, 1)
+
+            # единственное соединение занято - второе не дождется
+            with pytest.raises(PoolTimeoutError):
+                await engine.connect()
+
+        stats = engine.pool.dict()
+        assert (stats["checked_out"], stats["idle"], stats["overflow"]) == (0, 1, 0)
+        assert stats["timeouts"] == 1
+        assert stats["acquire"]["count"] == 2
+        assert stats["acquire"]["max"] >= 0.05
+    finally:
+        await engine.dispose()
+
+
+async def test_pool_stats_endpoint(cli):
+    await cli.get("/couriers/1")
+    stats = (await (await cli.get("/stats")).json())["db_pool"]
+    assert stats["size"] == settings.db_pool_size
+    assert stats["checked_out"] == 0
+    assert stats["acquire"]["count"] > 0
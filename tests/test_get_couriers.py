@@ -9,6 +9,7 @@ from sqlalchemy.orm import selectinload
 from candy_delivery_app.db.context_uri import DB_URI
 from candy_delivery_app.db.db import update_base, session
 from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.deliveries import CourierRegionStats
 from candy_delivery_app.db.models.orders import Order
 
 dotenv.load_dotenv()
@@ -214,8 +215,16 @@ async def test_get_couriers(cli, session_):
     ).first()[0]
     assert current_courier.earnings == 15000
 
-    assert len(current_courier.delivery_data["regions"]["12"]) == 4
-    assert len(current_courier.delivery_data["regions"]["9"]) == 2
+    stats = dict(
+        (
+            await session_.execute(
+                select(CourierRegionStats.region, CourierRegionStats.deliveries).where(
+                    CourierRegionStats.courier_id == courier_id
+                )
+            )
+        ).fetchall()
+    )
+    assert stats == {12: 4, 9: 2}
 
     resp = await cli.get(f"/couriers/{courier_id}", json={"courier_id": courier_id})
     courier_data = await resp.json()
@@ -228,3 +237,45 @@ async def test_get_couriers(cli, session_):
     assert courier_data["earnings"] == 15000
 
     assert current_courier.orders == []
+
+    resp = await cli.get("/couriers", params={"ids": f"{courier_id},100,1"})
+    assert resp.status == 200
+    couriers_data = await resp.json()
+    assert couriers_data["not_found"] == [100]
+    assert [data["courier_id"] for data in couriers_data["couriers"]] == [2, 1]
+    assert couriers_data["couriers"][0] == courier_data
+
+
+async def test_get_couriers_batch(cli, session_):
+    await update_base()
+    await cli.post(
+        "/couriers",
+        json={
+            "data": [
+                {
+                    "courier_id": courier_id,
+                    "courier_type": "foot",
+                    "regions": [1],
+                    "working_hours": ["09:00-18:00"],
+                }
+                for courier_id in (1, 2, 3)
+            ]
+        },
+    )
+
+    resp = await cli.get("/couriers?ids=3&ids=1,2,3")
+    assert resp.status == 200
+    couriers_data = await resp.json()
+    assert [data["courier_id"] for data in couriers_data["couriers"]] == [3, 1, 2]
+    assert couriers_data["not_found"] == []
+    assert couriers_data["couriers"][0] == {
+        "courier_id": 3,
+        "courier_type": "foot",
+        "regions": [1],
+        "working_hours": ["09:00-18:00"],
+        "earnings": 0,
+    }
+
+    for query in ("", "?ids=", "?ids=a", "?ids=-1", "?ids=" + ",".join(["1"] * 1001)):
+        resp = await cli.get(f"/couriers{query}")
+        assert resp.status == 400
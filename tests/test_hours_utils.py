@@ -0,0 +1,65 @@
+from candy_delivery_app.db.models.utils import check_order_can_be_delivered_by_courier
+from candy_delivery_app.models.utils import (
+    get_hours_and_minutes_from_str,
+    get_hours_cache_stats,
+    hours_validate,
+    get_timedeltas_from_string,
+    get_minutes_mask_from_timedeltas,
+    get_minutes_ranges_from_mask,
+    get_minutes_mask_from_ranges,
+)
+
+
+def get_mask(hours):
+    return get_minutes_mask_from_timedeltas(get_timedeltas_from_string(hours))
+
+
+def test_minutes_mask():
+    assert get_mask([]) == 0
+    assert get_mask(["00:00-00:01"]) == 1
+    assert get_mask(["00:01-00:03"]) == 0b110
+    assert get_mask(["23:59-23:59"]) == 0
+    assert get_mask(["21:00-02:00"]) == 0
+    assert get_mask(["00:00-23:59"]).bit_length() == 24 * 60 - 1
+    assert get_mask(["09:00-10:00", "09:30-11:00"]) == get_mask(["09:00-11:00"])
+
+
+def test_check_order_can_be_delivered_by_courier():
+    courier_mask = get_mask(["11:35-14:05", "09:00-11:00"])
+
+    assert check_order_can_be_delivered_by_courier(
+        order_mask=get_mask(["10:00-11:00"]), courier_mask=courier_mask
+    )
+    assert check_order_can_be_delivered_by_courier(
+        order_mask=get_mask(["14:04-18:00"]), courier_mask=courier_mask
+    )
+    # концы промежутков не пересекаются
+    assert not check_order_can_be_delivered_by_courier(
+        order_mask=get_mask(["11:00-11:35"]), courier_mask=courier_mask
+    )
+    assert not check_order_can_be_delivered_by_courier(
+        order_mask=get_mask(["14:05-20:00", "07:00-09:00"]), courier_mask=courier_mask
+    )
+
+
+def test_minutes_ranges():
+    mask = get_mask(["11:35-14:05", "09:00-11:00", "10:30-11:30", "23:00-23:59"])
+    assert get_minutes_ranges_from_mask(mask) == [(540, 690), (695, 845), (1380, 1439)]
+    assert get_minutes_mask_from_ranges(get_minutes_ranges_from_mask(mask)) == mask
+    assert get_minutes_ranges_from_mask(0) == []
+    assert get_minutes_ranges_from_mask(1) == [(0, 1)]
+
+
+def test_hours_cache():
+    get_hours_and_minutes_from_str.cache_clear()
+
+    for _ in range(3):
+        hours_validate(["09:00-18:00", "10:00-11:30"])
+        assert get_timedeltas_from_string(["10:00-11:30"]) == [
+            {"first_time": 36000, "second_time": 41400}
+        ]
+
+    stats = get_hours_cache_stats()
+    assert stats["misses"] == 2
+    assert stats["hits"] == 7
+    assert stats["size"] == 2
@@ -0,0 +1,214 @@
+import asyncio
+import datetime
+import json
+import os
+
+import dotenv
+from sqlalchemy import inspect
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import Base, update_base, session, engine
+from candy_delivery_app.db.migrations import migrate, MIGRATIONS
+from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.deliveries import Delivery
+from candy_delivery_app.db.models.orders import Order
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+async def test_migrations(loop, session_):
+    await update_base()
+
+    versions = [
+        version
+        for (version,) in await session_.execute(
+            "SELECT version FROM schema_migrations ORDER BY version"
+        )
+    ]
+    assert versions == sorted(migration.version for migration in MIGRATIONS)
+
+    assert await migrate() == []
+
+    indexes = {
+        name
+        for (name,) in await session_.execute(
+            "SELECT indexname FROM pg_indexes WHERE tablename IN ('orders', 'couriers')"
+        )
+    }
+    assert {
+        "ix_orders_delivery_hours_mask",
+        "ix_orders_free_region_weight",
+        "ix_orders_courier_id",
+        "ix_couriers_regions",
+    } <= indexes
+
+
+async def test_migrations_match_models(loop):
+    await update_base()
+
+    def get_schema(conn, metadata):
+        inspector = inspect(conn)
+        return {
+            table: (
+                {
+                    column["name"]: (str(column["type"]), column["nullable"])
+                    for column in inspector.get_columns(table)
+                },
+                {index["name"] for index in inspector.get_indexes(table)},
+            )
+            for table in metadata.tables
+            if table != "schema_migrations"
+        }
+
+    async with engine.connect() as conn:
+        db_schema = await conn.run_sync(get_schema, Base.metadata)
+    assert {Courier.__tablename__, Order.__tablename__} < set(db_schema)
+
+    # новая база, собранная миграциями, совпадает с моделями
+    for table_name, (columns, indexes) in db_schema.items():
+        table = Base.metadata.tables[table_name]
+        assert set(columns) == set(table.columns.keys()), table_name
+        for column in table.columns:
+            assert columns[column.name][1] == column.nullable, column
+        assert indexes == {index.name for index in table.indexes}, table_name
+
+
+async def test_rating_migration(loop, session_):
+    await update_base()
+
+    # база до миграции 6: времена доставок в couriers.delivery_data
+    await session_.execute("ALTER TABLE couriers ADD COLUMN delivery_data json")
+    await session_.execute(
+        "INSERT INTO couriers "
+        "(id, courier_type, regions, working_hours, last_delivery_time, delivery_data) "
+        "VALUES (1, 'FOOT', '{1, 2}', '{}', 1616434714.5, CAST(:delivery_data AS json))",
+        {
+            "delivery_data": json.dumps(
+                {
+                    "regions": {"1": [600, 1200], "2": [2000]},
+                    "not_completed_regions": {"1": [300.5]},
+                }
+            )
+        },
+    )
+    await session_.execute(
+        "INSERT INTO couriers (id, courier_type, regions, working_hours) "
+        "VALUES (2, 'FOOT', '{1}', '{}')"
+    )
+    await session_.execute("DELETE FROM schema_migrations WHERE version IN (4, 6)")
+    await session_.commit()
+
+    assert [migration.version for migration in await migrate()] == [4, 6]
+
+    ratings = dict(
+        (await session_.execute("SELECT id, rating FROM couriers")).fetchall()
+    )
+    assert ratings == {1: 3.75, 2: None}
+
+    stats = (
+        await session_.execute(
+            "SELECT courier_id, region, deliveries, total_time "
+            "FROM courier_region_stats ORDER BY region"
+        )
+    ).fetchall()
+    assert stats == [(1, 1, 2, 1800.0), (1, 2, 1, 2000.0)]
+
+    deliveries = (
+        await session_.execute(
+            "SELECT courier_id, region, bag_id, duration, "
+            "extract(epoch FROM completed_at)::float8 FROM deliveries"
+        )
+    ).fetchall()
+    assert deliveries == [(1, 1, 1, 300.5, 1616434714.5)]
+
+    assert not (
+        await session_.execute(
+            "SELECT EXISTS (SELECT 1 FROM information_schema.columns "
+            "WHERE table_name = 'couriers' AND column_name = 'delivery_data')"
+        )
+    ).scalar()
+
+
+async def test_deliveries_partitions(loop, session_):
+    await update_base()
+
+    # доставка в месяц без секции попадает в deliveries_default
+    await session_.execute(
+        "INSERT INTO deliveries "
+        "(order_id, completed_at, courier_id, region, bag_id, duration) "
+        "VALUES (1, '2099-02-10T10:00:00Z', 1, 1, 1, 60)"
+    )
+    await session_.commit()
+
+    async with engine.begin() as conn:
+        created = await Delivery.create_partitions(
+            conn, today=datetime.date(2098, 12, 15), months_ahead=3
+        )
+    # февраль уже занят строкой в deliveries_default - пропущен
+    assert created == [
+        "deliveries_y2098m12",
+        "deliveries_y2099m01",
+        "deliveries_y2099m03",
+    ]
+
+    await session_.execute(
+        "INSERT INTO deliveries "
+        "(order_id, completed_at, courier_id, region, bag_id, duration) "
+        "VALUES (2, '2099-01-31T23:59:59Z', 1, 1, 1, 60)"
+    )
+    partitions = dict(
+        (
+            await session_.execute(
+                "SELECT order_id, tableoid::regclass::text FROM deliveries"
+            )
+        ).fetchall()
+    )
+    assert partitions == {1: "deliveries_default", 2: "deliveries_y2099m01"}
+    await session_.commit()
+
+    async with engine.begin() as conn:
+        assert (
+            await Delivery.create_partitions(
+                conn, today=datetime.date(2098, 12, 15), months_ahead=3
+            )
+            == []
+        )
+
+
+async def test_invalid_index_recreated(loop, session_):
+    await update_base()
+
+    # так выглядит индекс после прерванного CREATE INDEX CONCURRENTLY
+    await session_.execute(
+        "UPDATE pg_index SET indisvalid = false "
+        "WHERE indexrelid = 'ix_orders_courier_id'::regclass"
+    )
+    await session_.execute("DELETE FROM schema_migrations WHERE version = 3")
+    await session_.commit()
+
+    assert [migration.version for migration in await migrate()] == [3]
+
+    assert (
+        await session_.execute(
+            "SELECT indisvalid FROM pg_index "
+            "WHERE indexrelid = 'ix_orders_courier_id'::regclass"
+        )
+    ).scalar()
@@ -9,6 +9,7 @@ from sqlalchemy.orm import selectinload
 from candy_delivery_app.db.context_uri import DB_URI
 from candy_delivery_app.db.db import update_base, session
 from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.deliveries import CourierRegionStats, Delivery
 from candy_delivery_app.db.models.orders import Order
 
 dotenv.load_dotenv()
@@ -156,7 +157,21 @@ async def test_couriers_complete(cli, session_):
     delivery_time = (
         now.timestamp() - datetime.datetime.fromisoformat(assign_time).timestamp()
     )
-    assert current_courier.delivery_data["regions"]["9"][0] == delivery_time
+    delivery: Delivery = (
+        await session_.execute(select(Delivery).where(Delivery.order_id == order_id))
+    ).first()[0]
+    assert (delivery.courier_id, delivery.region, delivery.bag_id) == (courier_id, 9, 1)
+    assert delivery.duration == delivery_time
+    stats: CourierRegionStats = (
+        await session_.execute(
+            select(CourierRegionStats).where(
+                CourierRegionStats.courier_id == courier_id
+            )
+        )
+    ).first()[0]
+    assert (stats.region, stats.deliveries) == (9, 1)
+    assert stats.total_time == delivery_time
+    assert current_courier.bag_id == 2
     assert current_courier.last_delivery_time == now.timestamp()
     assert current_order.courier_id is None
     assert current_order.completed is True
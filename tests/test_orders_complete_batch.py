@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+import os
+
+import dotenv
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.deliveries import Delivery
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+async def test_couriers_complete_batch(cli, session_):
+    await update_base()
+    await Courier.create_couriers(
+        json_data={
+            "data": [
+                {
+                    "courier_id": courier_id,
+                    "courier_type": "car",
+                    "regions": [courier_id],
+                    "working_hours": ["00:00-23:59"],
+                }
+                for courier_id in (1, 2)
+            ]
+        },
+        session=session_,
+    )
+    resp = await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": order_id,
+                    "weight": 1,
+                    "region": 1 if order_id < 3 else 2,
+                    "delivery_hours": ["00:00-23:59"],
+                }
+                for order_id in (1, 2, 3)
+            ]
+        },
+    )
+    assert resp.status == 201
+
+    resp = await cli.post("/orders/assign/batch", json={"couriers_ids": [1, 2]})
+    assert resp.status == 200
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    first = (now + datetime.timedelta(minutes=10)).isoformat()
+    second = (now + datetime.timedelta(minutes=25)).isoformat()
+    resp = await cli.post(
+        "/orders/complete/batch",
+        json={
+            "orders": [
+                # пришли не по порядку - завершаются по complete_time
+                {"courier_id": 1, "order_id": 2, "complete_time": second},
+                {"courier_id": 1, "order_id": 1, "complete_time": first},
+                {"courier_id": 1, "order_id": 3, "complete_time": first},
+                {"courier_id": 2, "order_id": 3, "complete_time": first},
+                {"courier_id": 2, "order_id": 100, "complete_time": first},
+            ]
+        },
+    )
+    assert resp.status == 200
+    assert await resp.json() == {
+        "orders": [
+            {"order_id": 2, "courier_id": 1, "completed": True},
+            {"order_id": 1, "courier_id": 1, "completed": True},
+            {"order_id": 3, "courier_id": 1, "completed": False},
+            {"order_id": 3, "courier_id": 2, "completed": True},
+            {"order_id": 100, "courier_id": 2, "completed": False},
+        ]
+    }
+
+    await session_.commit()
+    deliveries = (
+        await session_.execute(
+            select(Delivery.order_id, Delivery.duration)
+            .where(Delivery.courier_id == 1)
+            .order_by(Delivery.completed_at)
+        )
+    ).fetchall()
+    assert [order_id for order_id, _ in deliveries] == [1, 2]
+    assert round(deliveries[1].duration - deliveries[0].duration) == 5 * 60
+    courier = await Courier.get_courier(session=session_, courier_id=1)
+    assert courier.bag_id == 2
+
+    # повтор после переподключения: то же время - успех, другое - нет
+    resp = await cli.post(
+        "/orders/complete/batch",
+        json={
+            "orders": [
+                {"courier_id": 1, "order_id": 1, "complete_time": first},
+                {"courier_id": 1, "order_id": 2, "complete_time": first},
+            ]
+        },
+    )
+    assert (await resp.json())["orders"] == [
+        {"order_id": 1, "courier_id": 1, "completed": True},
+        {"order_id": 2, "courier_id": 1, "completed": False},
+    ]
+
+    for json_data in (
+        {"orders": []},
+        {"orders": [{"courier_id": 1, "order_id": 1, "complete_time": "fds"}]},
+        {"orders": [{"courier_id": 1, "order_id": 1}]},
+        {"data": []},
+    ):
+        resp = await cli.post("/orders/complete/batch", json=json_data)
+        assert resp.status == 400
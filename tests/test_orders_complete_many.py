@@ -9,6 +9,7 @@ from sqlalchemy.orm import selectinload
 from candy_delivery_app.db.context_uri import DB_URI
 from candy_delivery_app.db.db import update_base, session
 from candy_delivery_app.db.models.couriers import Courier
+from candy_delivery_app.db.models.deliveries import CourierRegionStats, Delivery
 from candy_delivery_app.db.models.orders import Order
 
 dotenv.load_dotenv()
@@ -241,8 +242,29 @@ async def test_couriers_complete_many(cli, session_):
         )
     ).first()[0]
     assert current_courier.earnings == 15000
-    assert len(current_courier.delivery_data["regions"]["12"]) == 3
-    assert len(current_courier.delivery_data["regions"]["9"]) == 2
-    assert len(current_courier.delivery_data["not_completed_regions"]["12"]) == 1
+    stats = dict(
+        (
+            await session_.execute(
+                select(CourierRegionStats.region, CourierRegionStats.deliveries).where(
+                    CourierRegionStats.courier_id == courier_id
+                )
+            )
+        ).fetchall()
+    )
+    assert stats == {12: 3, 9: 2}
+    # доставки начатого развоза в итоги еще не попали
+    pending = (
+        (
+            await session_.execute(
+                select(Delivery.region).where(
+                    Delivery.courier_id == courier_id,
+                    Delivery.bag_id == current_courier.bag_id,
+                )
+            )
+        )
+        .scalars()
+        .all()
+    )
+    assert pending == [12]
 
     assert len(current_courier.orders) == 1
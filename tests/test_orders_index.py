@@ -0,0 +1,144 @@
+import asyncio
+import datetime
+import os
+
+import dotenv
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.orders import Order
+from candy_delivery_app.db.orders_index import orders_index, FreeOrder
+from candy_delivery_app.models.settings import settings
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+@pytest.fixture
+def index_enabled():
+    settings.orders_index = True
+    yield
+    settings.orders_index = False
+    orders_index.ready = False
+
+
+def test_orders_index_sorted_by_weight(index_enabled):
+    orders_index.rebuild(
+        [
+            FreeOrder(id=1, weight=5, region=1, delivery_hours_mask=1),
+            FreeOrder(id=2, weight=0.5, region=2, delivery_hours_mask=1),
+            FreeOrder(id=3, weight=12, region=1, delivery_hours_mask=1),
+            FreeOrder(id=4, weight=3, region=3, delivery_hours_mask=1),
+        ]
+    )
+    orders = orders_index.get_orders(regions=[1, 2], max_weight=10, hours_mask=1)
+    assert [order.id for order in orders] == [2, 1]
+
+    orders_index.discard([2, 1337])
+    orders = orders_index.get_orders(regions=[1, 2, 3], max_weight=50, hours_mask=1)
+    assert [order.id for order in orders] == [4, 1, 3]
+
+
+async def test_orders_index(cli, session_, index_enabled):
+    await update_base()
+    await cli.post(
+        "/couriers",
+        json={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "bike",
+                    "regions": [1, 2],
+                    "working_hours": ["09:00-18:00"],
+                },
+            ]
+        },
+    )
+    await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 1,
+                    "weight": 10,
+                    "region": 1,
+                    "delivery_hours": ["09:00-18:00"],
+                },
+                {
+                    "order_id": 2,
+                    "weight": 4,
+                    "region": 2,
+                    "delivery_hours": ["09:00-18:00"],
+                },
+            ]
+        },
+    )
+
+    await Order.rebuild_orders_index(session=session_)
+    assert len(orders_index) == 2
+
+    await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 3,
+                    "weight": 1,
+                    "region": 2,
+                    "delivery_hours": ["20:00-21:00"],
+                },
+            ]
+        },
+    )
+    assert len(orders_index) == 3
+
+    r = await cli.post("/orders/assign", json={"courier_id": 1})
+    json_data = await r.json()
+    assert sorted(order["id"] for order in json_data["orders"]) == [1, 2]
+    assert 1 not in orders_index
+    assert 2 not in orders_index
+    assert 3 in orders_index
+
+    await cli.patch("/couriers/1", json={"courier_type": "foot"})
+    assert 2 in orders_index
+    assert 1 not in orders_index
+
+    r = await cli.post(
+        "/orders/complete",
+        json={
+            "courier_id": 1,
+            "order_id": 1,
+            "complete_time": datetime.datetime.now().isoformat(),
+        },
+    )
+    assert r.status == 200
+    assert 1 not in orders_index
+    assert len(orders_index) == 2
@@ -166,3 +166,62 @@ async def test_couriers_patch(cli, session_):
             assert order.courier_id == 3
         else:
             assert order.courier_id is None
+
+
+async def test_couriers_patch_keeps_fitting_orders(cli, session_):
+    await update_base()
+    await cli.post(
+        "/couriers",
+        json={
+            "data": [
+                {
+                    "courier_id": 1,
+                    "courier_type": "bike",
+                    "regions": [1, 2],
+                    "working_hours": ["09:00-18:00"],
+                },
+            ]
+        },
+    )
+    await cli.post(
+        "/orders",
+        json={
+            "data": [
+                {
+                    "order_id": 1,
+                    "weight": 7,
+                    "region": 1,
+                    "delivery_hours": ["09:00-10:00"],
+                },
+                {
+                    "order_id": 2,
+                    "weight": 8,
+                    "region": 2,
+                    "delivery_hours": ["17:00-19:00"],
+                },
+            ]
+        },
+    )
+    r = await cli.post("/orders/assign", json={"courier_id": 1})
+    assert len((await r.json())["orders"]) == 2
+
+    for new_data in (
+        {"courier_type": "car"},
+        {"regions": [2, 1, 3]},
+        {"working_hours": ["09:30-17:30"]},
+        {"courier_type": "car", "regions": [1, 2], "working_hours": ["09:30-17:30"]},
+    ):
+        r = await cli.patch("/couriers/1", json=new_data)
+        assert r.status == 200
+
+        orders = (
+            await session_.execute(select(Order.id).where(Order.courier_id == 1))
+        ).fetchall()
+        assert sorted(order_id for (order_id,) in orders) == [1, 2]
+
+    r = await cli.patch("/couriers/1", json={"regions": [2], "courier_type": "foot"})
+    assert r.status == 200
+    orders = (
+        await session_.execute(select(Order.id).where(Order.courier_id == 1))
+    ).fetchall()
+    assert orders == [(2,)]
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import os
+
+import dotenv
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base
+from candy_delivery_app.replay import (
+    load_requests,
+    percentile,
+    replay_app,
+    replay_url,
+    format_stats,
+)
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([3.0], 99) == 3
+    assert percentile([], 50) == 0
+
+
+def test_load_requests():
+    requests = load_requests(
+        [
+            '{"method": "get", "path": "/couriers/1"}',
+            "",
+            '{"method": "POST", "path": "/orders/assign", "json": {"courier_id": 1}}',
+        ]
+    )
+    assert [(request.method, request.path) for request in requests] == [
+        ("GET", "/couriers/1"),
+        ("POST", "/orders/assign"),
+    ]
+    assert requests[1].json == {"courier_id": 1}
+
+    with pytest.raises(ValueError):
+        load_requests(['{"request_id": "1", "title": "not a request"}'])
+
+
+async def test_replay_app(loop):
+    await update_base()
+
+    app = web.Application()
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+
+    lines = [
+        {
+            "method": "POST",
+            "path": "/couriers",
+            "json": {
+                "data": [
+                    {
+                        "courier_id": courier_id,
+                        "courier_type": "car",
+                        "regions": [1],
+                        "working_hours": ["09:00-18:00"],
+                    }
+                    for courier_id in (1, 2)
+                ]
+            },
+        },
+        {
+            "method": "POST",
+            "path": "/orders",
+            "json": {
+                "data": [
+                    {
+                        "order_id": 1,
+                        "weight": 1,
+                        "region": 1,
+                        "delivery_hours": ["10:00-11:00"],
+                    }
+                ]
+            },
+        },
+        {"method": "POST", "path": "/orders/assign", "json": {"courier_id": 1}},
+        {"method": "GET", "path": "/couriers/1"},
+        {"method": "GET", "path": "/couriers/2"},
+        {"method": "GET", "path": "/couriers/3"},
+    ]
+    requests = load_requests(json.dumps(line) for line in lines)
+
+    stats = (await replay_app(app, requests, rate=1000, concurrency=1)).dict()
+    assert stats["requests"] == 6
+    assert stats["errors"] == 0
+    assert stats["throughput"] > 0
+
+    routes = stats["routes"]
+    assert routes["POST /couriers"]["statuses"] == {201: 1}
+    assert routes["POST /orders/assign"]["statuses"] == {200: 1}
+    assert routes["GET /couriers/{id}"]["count"] == 3
+    assert routes["GET /couriers/{id}"]["statuses"] == {200: 2, 404: 1}
+    assert (
+        routes["GET /couriers/{id}"]["p50"]
+        <= routes["GET /couriers/{id}"]["p99"]
+        <= routes["GET /couriers/{id}"]["max"]
+    )
+
+    stats = await replay_app(app, requests[3:] * 10, concurrency=4)
+    assert stats.dict()["routes"]["GET /couriers/{id}"]["count"] == 30
+    assert "GET /couriers/{id}" in format_stats(stats)
+
+
+async def test_replay_url(loop):
+    await update_base()
+
+    app = web.Application()
+    app.add_routes(couriers_router)
+
+    server = TestServer(app)
+    await server.start_server()
+    try:
+        requests = load_requests(['{"method": "GET", "path": "/couriers/1"}'] * 3)
+        stats = (
+            await replay_url(str(server.make_url("/")), requests, concurrency=2)
+        ).dict()
+    finally:
+        await server.close()
+
+    assert stats["errors"] == 0
+    assert stats["routes"]["GET /couriers/{id}"]["statuses"] == {404: 3}
@@ -0,0 +1,64 @@
+import asyncio
+import random
+from collections import namedtuple
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import stats_router
+from candy_delivery_app.business_models.orders.solver import (
+    get_best_orders_async,
+    shutdown_pool,
+    solver_stats,
+)
+from candy_delivery_app.business_models.orders.utils import get_best_orders
+from candy_delivery_app.models.settings import settings
+
+RawOrder = namedtuple("RawOrder", ["id", "weight"])
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application()
+    app.add_routes(stats_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+def solver_pool():
+    settings.solver_pool = True
+    settings.solver_pool_size = 1
+    settings.solver_inline_max_candidates = 10
+    yield
+    settings.solver_pool = False
+    settings.solver_pool_size = None
+    settings.solver_inline_max_candidates = 200
+    shutdown_pool()
+
+
+async def test_solver_pool(cli, solver_pool):
+    orders = sorted(
+        (RawOrder(i, round(random.uniform(0.01, 20), 2)) for i in range(100)),
+        key=lambda order: order.weight,
+    )
+    pool_calls = solver_stats.pool_solve_time.count
+    inline_calls = solver_stats.inline_solve_time.count
+
+    assert await get_best_orders_async(orders, capacity=50) == get_best_orders(
+        orders, capacity=50
+    )
+    assert solver_stats.pool_solve_time.count == pool_calls + 1
+
+    small_orders = [RawOrder(1, 1), RawOrder(2, 2), RawOrder(3, 3)]
+    assert await get_best_orders_async(small_orders, capacity=10) == small_orders[::-1]
+    assert solver_stats.inline_solve_time.count == inline_calls + 1
+
+    r = await cli.get("/stats")
+    json_data = await r.json()
+    assert json_data["solver"]["pool_solve_time"]["count"] == pool_calls + 1
+    assert json_data["solver"]["pool_queue_wait"]["count"] == pool_calls + 1
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import os
+
+import dotenv
+from sqlalchemy.future import select
+
+from candy_delivery_app.db.context_uri import DB_URI
+from candy_delivery_app.db.db import update_base, session
+from candy_delivery_app.db.models.orders import Order
+from candy_delivery_app.models.settings import settings
+
+dotenv.load_dotenv()
+
+DB_URI.set(os.getenv("TEST_DB_URI"))
+
+import pytest
+from aiohttp import web
+
+from candy_delivery_app.api import couriers_router, orders_router
+
+
+@pytest.fixture
+def loop():
+    return asyncio.get_event_loop()
+
+
+@pytest.fixture
+def cli(loop, aiohttp_client):
+    app = web.Application(client_max_size=1024)
+    app.add_routes(couriers_router)
+    app.add_routes(orders_router)
+    return loop.run_until_complete(aiohttp_client(app))
+
+
+@pytest.fixture
+async def session_():
+    async_session = session()
+
+    yield async_session
+
+    await async_session.close()
+
+
+@pytest.fixture
+def streaming():
+    min_size, chunk_size = (
+        settings.streaming_import_min_size,
+        settings.streaming_import_chunk_size,
+    )
+    settings.streaming_import_min_size, settings.streaming_import_chunk_size = 0, 2
+    yield
+    settings.streaming_import_min_size, settings.streaming_import_chunk_size = (
+        min_size,
+        chunk_size,
+    )
+
+
+@pytest.fixture
+def streaming_limits():
+    max_size, max_item_size = (
+        settings.streaming_import_max_size,
+        settings.streaming_import_max_item_size,
+    )
+    settings.streaming_import_max_size = 10 * 1024
+    settings.streaming_import_max_item_size = 1024
+    yield
+    settings.streaming_import_max_size, settings.streaming_import_max_item_size = (
+        max_size,
+        max_item_size,
+    )
+
+
+def get_body(data, piece_size=7):
+    body = json.dumps({"data": data}).encode()
+
+    # тело кусками без Content-Length, чтобы элементы рвались на границах
+    async def pieces():
+        for i in range(0, len(body), piece_size):
+            yield body[i : i + piece_size]
+
+    return pieces()
+
+
+def get_orders(orders_ids):
+    return [
+        {
+            "order_id": order_id,
+            "weight": 1.25,
+            "region": 1,
+            "delivery_hours": ["10:00-12:00"],
+        }
+        for order_id in orders_ids
+    ]
+
+
+async def test_streaming_import(cli, session_, streaming):
+    await update_base()
+
+    # больше client_max_size
+    response = await cli.post("/orders", data=get_body(get_orders(range(1, 101))))
+    assert response.status == 201
+    assert await response.json() == {"orders": [{"id": i} for i in range(1, 101)]}
+
+    orders = (await session_.execute(select(Order).order_by(Order.id))).scalars().all()
+    assert [order.id for order in orders] == list(range(1, 101))
+    assert orders[0].weight == 1.25
+    assert orders[0].delivery_hours_mask == ((1 << 120) - 1) << 600
+
+    response = await cli.post(
+        "/couriers",
+        data=get_body(
+            [
+                {
+                    "courier_id": 1,
+                    "courier_type": "car",
+                    "regions": [1],
+                    "working_hours": ["09:00-18:00"],
+                }
+            ]
+        ),
+    )
+    assert response.status == 201
+    assert await response.json() == {"couriers": [{"id": 1}]}
+
+    response = await cli.post("/orders/assign", json={"courier_id": 1})
+    assert len((await response.json())["orders"]) == 40
+
+
+async def test_streaming_import_errors(cli, session_, streaming):
+    await update_base()
+
+    data = get_orders(range(1, 8))
+    data[2]["weight"] = -1
+    data[5]["region"] = "a"
+    data[5]["delivery_hours"] = ["25:00-26:00"]
+
+    response = await cli.post("/orders", data=get_body(data))
+    assert response.status == 400
+    stream_response = await response.json()
+
+    settings.streaming_import_min_size = 10**9
+    response = await cli.post("/orders", json={"data": data})
+    assert response.status == 400
+    assert stream_response == await response.json()
+    settings.streaming_import_min_size = 0
+
+    assert stream_response["validation_error"]["orders"] == [{"id": 3}, {"id": 6}]
+    locations = [
+        error["location"]
+        for error in stream_response["validation_error"]["errors_data"]
+    ]
+    assert ["data", 2, "weight"] in locations
+    assert ["data", 5, "region"] in locations
+    assert {tuple(location[:2]) for location in locations} == {("data", 2), ("data", 5)}
+
+    response = await cli.post("/orders", data=get_body(get_orders([1, 2, 3, 2])))
+    assert response.status == 400
+    json_response = await response.json()
+    assert json_response["validation_error"]["orders"] == [{"id": 2}]
+    assert [
+        error["location"] for error in json_response["validation_error"]["errors_data"]
+    ] == [["data", 1, "order_id"], ["data", 3, "order_id"]]
+
+    response = await cli.post("/orders", data=b'{"data": [{"order_id": 1,')
+    assert response.status == 400
+
+    response = await cli.post("/orders", data=b'{"orders": []}')
+    assert response.status == 400
+
+    assert (await session_.execute(select(Order.id))).scalars().all() == []
+
+
+async def test_streaming_import_limits(cli, session_, streaming, streaming_limits):
+    await update_base()
+
+    # незаконченный элемент не копится в памяти до конца тела
+    body = b'{"data": [{"order_id": 1, "delivery_hours": ["' + b"a" * 5000
+    response = await cli.post("/orders", data=body)
+    assert response.status == 400
+
+    # предел на элемент, а не на весь прочитанный кусок
+    response = await cli.post(
+        "/orders", data=get_body(get_orders(range(1, 101)), piece_size=4096)
+    )
+    assert response.status == 201
+
+    data = get_orders(range(101, 301))
+    response = await cli.post("/orders", data=get_body(data, piece_size=4096))
+    assert response.status == 413
+
+    response = await cli.post("/orders", json={"data": data})
+    assert response.status == 413
+
+    orders_ids = (await session_.execute(select(Order.id))).scalars().all()
+    assert sorted(orders_ids) == list(range(1, 101))
+
+
+async def test_streaming_import_not_objects(cli, session_, streaming):
+    await update_base()
+
+    data = get_orders([1, 2])
+    data[1]["weight"] = -1
+    data = [1, *data, {"weight": 1}]
+
+    response = await cli.post("/orders", data=get_body(data))
+    assert response.status == 400
+    stream_response = await response.json()
+
+    settings.streaming_import_min_size = 10**9
+    response = await cli.post("/orders", json={"data": data})
+    assert response.status == 400
+    assert stream_response == await response.json()
+    settings.streaming_import_min_size = 0
+
+    # у элементов без id в ответе только ошибки
+    assert stream_response["validation_error"]["orders"] == [{"id": 2}]
+    locations = {
+        tuple(error["location"][:2])
+        for error in stream_response["validation_error"]["errors_data"]
+    }
+    assert locations == {("data", 0), ("data", 2), ("data", 3)}
+
+    response = await cli.post("/couriers", data=get_body([1]))
+    assert response.status == 400
+    assert (await response.json())["validation_error"]["couriers"] == []
+
+    assert (await session_.execute(select(Order.id))).scalars().all() == []